@@ -1,25 +1,79 @@
 import os
 import sys
-import random
+import time
 import math
 import pygame
 
-from scripts.utils import load_image, load_images, Animation
+from scripts.utils import load_image, load_images, flip_image, Animation, SilentSound
 from scripts.entities import PhysicsEntity, Player, Enemy
 from scripts.tilemap import Tilemap
 from scripts.clouds import Clouds
-from scripts.particle import Particle
-from scripts.spark import Spark
+from scripts.particle import ParticleSystem
+from scripts.spark import SparkSystem
+from scripts.projectile import ProjectileSystem
+from scripts.levelcache import LevelCache
+from scripts.pool import Pool
+from scripts.spawner import SpawnScheduler
+from scripts.governor import EffectsGovernor
+from scripts.outline import outline_images
+from scripts.atlas import Atlas, DrawQueue
+from scripts.transition import Transition
+from scripts.timestep import FixedTimestep
+from scripts.present import Presenter, create_screen
+from scripts.profiler import FrameProfiler
+from scripts.replay import RandomStreams, InputRecorder, load_replay, hash_state
 
 class Game:
-    def __init__(self):
+    # streaming=True -> converted (.lvl) levels only keep the chunks near the camera in memory
+    # headless=True  -> no window and no sound, for running the game logic with run_headless()
+    # tick_rate      -> game logic ticks a second, the physics numbers are made for 60
+    # max_fps        -> most frames drawn a second, frames in between ticks are interpolated (0 -> no limit)
+    # dirty_rects    -> only send the parts of the screen that changed to the window (when the camera stands still)
+    # scale          -> window is the 320x240 display times this
+    # window_size    -> (w, h) window of any size instead, the display is stretched to fit
+    # scaled         -> let SDL scale the display up (pygame.SCALED) instead of us
+    # profile        -> time each part of the frame from the start (F3 turns it on and off)
+    # trace_path     -> .csv or .json file the profiler writes the last frames to (F4 and when you quit)
+    # seed           -> seed for all the random numbers, None -> a new one every run
+    # record_path    -> .rpl file the inputs of every tick are saved to when you quit
+    # replay_path    -> .rpl file to play back instead of the keyboard, checked tick by tick
+    def __init__(self, streaming=False, headless=False, tick_rate=60, max_fps=120, dirty_rects=False,
+                 scale=2, window_size=None, scaled=False, profile=False, trace_path=None,
+                 seed=None, record_path=None, replay_path=None):
+        if headless:
+            # has to be set before pygame.init()
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
         pygame.init()
 
-        SCREEN_WIDTH = 640
-        SCREEN_HEIGHT = 480
+        self.streaming = streaming
+        self.headless = headless
+        self.max_fps = max_fps
+
+        # a replay brings its own seed, start level and tick rate
+        self.replay = load_replay(replay_path) if replay_path else None
+        if self.replay:
+            seed = self.replay.seed
+            tick_rate = self.replay.tick_rate
+        # one random.Random per part of the game (enemies, leaves, effects, ...) from one seed
+        self.rng = RandomStreams(seed)
+        # ticks run so far
+        self.ticks = 0
+        self.record_path = record_path
+        self.recorder = InputRecorder(self.rng.seed, level=self.replay.level if self.replay else 0, tick_rate=tick_rate) if record_path else None
+        # game logic runs in fixed ticks, up to 5 a frame to catch up when drawing is slow
+        self.timestep = FixedTimestep(tick_rate=tick_rate, max_ticks=5)
+        # camera and entity positions at the start of the last tick, to draw in between ticks
+        self.previous = None
+        # where the frame time goes, does nothing until it is turned on
+        self.profiler = FrameProfiler(enabled=profile, trace_path=trace_path)
 
         pygame.display.set_caption('Platformer Game')
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        # .convert() in load_image needs a display mode, even with no window
+        if headless:
+            self.screen = pygame.display.set_mode((1, 1))
+        else:
+            self.screen = create_screen((320, 240), scale=scale, window_size=window_size, scaled=scaled)
         """
         .Surface()
         generates an empty image with (w, h) dimension
@@ -28,16 +82,23 @@ class Game:
         we render on to this display and scale it up to the screen
 
         Steps
-        1) create a display half the size of the screen
+        1) create a display half the size of the screen (or a third, a quarter, ... with scale)
         2) render everything onto the display
-        3) scale the display to fit the screen
-        4) blit display  on top of the screen
+        3) scale the display to fit the screen, straight onto the screen (Presenter)
         """
         self.display = pygame.Surface((320, 240), pygame.SRCALPHA)
         self.display_2 = pygame.Surface((320, 240))
+        # scales display_2 up onto the screen
+        self.presenter = Presenter(self.screen, dirty_rects=dirty_rects)
+        # camera offset of the last frame drawn, the whole screen changes when it moves
+        self.render_scroll = None
+        self.last_render_scroll = None
         self.clock = pygame.time.Clock()
         
         self.movement = [False, False]
+        # left / right keys held down right now, read_inputs() keeps this between frames
+        # (self.movement is what the last tick ran with, frames with no tick don't change it)
+        self.held_movement = [False, False]
         
         self.assets = {
             'decor': load_images('tiles/decor'),
@@ -56,17 +117,46 @@ class Game:
             'player/wall_slide': Animation(load_images('entities/player/wall_slide')),
             'particle/leaf': Animation(load_images('particles/leaf'), img_dur=20, loop=False),
             'particle/particle': Animation(load_images('particles/particle'), img_dur=6, loop=False),
-            'gun' : load_image('gun.png'),
+            'gun' : load_image('gun.png', flip=True),
             'projectile' : load_image('projectile.png'),
         }
 
+        # make the outlines of everything that moves now, not on the first frame it is drawn
+        for key in self.assets:
+            if key.startswith('player/') or key.startswith('enemy/'):
+                outline_images(self.assets[key].images)
+                outline_images(self.assets[key].flipped)
+        outline_images([self.assets['gun'], flip_image(self.assets['gun']), self.assets['projectile']])
+
+        # every small image (both ways they face) packed into a few surfaces
+        atlas_images = [flip_image(self.assets['gun'])]
+        for key, asset in self.assets.items():
+            # the background is blitted straight onto display_2, never through a queue
+            if key == 'background':
+                continue
+            if isinstance(asset, Animation):
+                atlas_images += asset.images + asset.flipped
+            elif isinstance(asset, list):
+                atlas_images += asset
+            else:
+                atlas_images.append(asset)
+        self.atlas = Atlas(page_size=512)
+        self.atlas.build(atlas_images)
+
+        # the renderers blit into these instead of the surfaces
+        # each one goes to the surface in one Surface.blits() call (flush)
+        self.display_queue = DrawQueue(self.display, self.atlas)
+        self.display_2_queue = DrawQueue(self.display_2, self.atlas)
+
         # load sound
+        # headless -> sounds that do nothing, so the game code doesn't have to check
+        sound = SilentSound if headless else pygame.mixer.Sound
         self.sfx = {
-            'jump': pygame.mixer.Sound('data/sfx/jump.wav'),
-            'dash': pygame.mixer.Sound('data/sfx/dash.wav'),
-            'hit': pygame.mixer.Sound('data/sfx/hit.wav'),
-            'shoot': pygame.mixer.Sound('data/sfx/shoot.wav'),
-            'ambience': pygame.mixer.Sound('data/sfx/ambience.wav'),
+            'jump': sound('data/sfx/jump.wav'),
+            'dash': sound('data/sfx/dash.wav'),
+            'hit': sound('data/sfx/hit.wav'),
+            'shoot': sound('data/sfx/shoot.wav'),
+            'ambience': sound('data/sfx/ambience.wav'),
         }
         
         # adujst sound -> sound mix
@@ -76,42 +166,129 @@ class Game:
         self.sfx['shoot'].set_volume(0.4)
         self.sfx['ambience'].set_volume(0.2)
 
-        self.clouds = Clouds(self.assets['clouds'], count=16)
+        self.clouds = Clouds(self.assets['clouds'], count=16, rng=self.rng.clouds)
+
+        # spawns fewer effects when frames take longer than 60 fps allows
+        self.governor = EffectsGovernor(target_ms=1000 / 60)
+
+        # entities take their animations from here and give them back on action changes
+        self.animation_pool = Pool(lambda: Animation([]))
         
         self.player = Player(self, (50, 50), (8, 15))
         
         self.tilemap = Tilemap(self, tile_size=16)
+        # levels already set up, so restarting a level doesn't load it again
+        self.level_cache = LevelCache(max_levels=3)
 
-        self.level = 0
+        self.enemies = []
+        self.level = self.replay.level if self.replay else 0
         self.load_level(self.level)
         
-        self.projectiles = []
-        self.particles = []
-        self.sparks = []
+        self.projectiles = ProjectileSystem(capacity=1024)
+        self.particles = ParticleSystem(self)
+        self.sparks = SparkSystem()
         self.scroll = [0, 0]
         self.dead = 0
 
         # circle that shrinks to black at the end of a level
         # circle that expands out to reveal the next level
         self.transition = -30
+        self.transition_effect = Transition(self.display.get_size(), shape='circle', steps=30)
+        self.transition_effect.prepare()
 
         self.screenshake = 0  
     
+    def level_path(self, map_id):
+        # use the binary level if the map has been converted (python scripts/levelfile.py ...)
+        path = 'data/maps/' + str(map_id)
+        if os.path.exists(path + '.lvl'):
+            return path + '.lvl'
+        return path + '.json'
+
+    def level_count(self):
+        # 0.json and 0.lvl are the same level
+        return len({os.path.splitext(name)[0] for name in os.listdir('data/maps')})
+
+    def state_hash(self):
+        """
+        crc32 of everything that decides how the game goes on (not the effects, the governor
+        spawns fewer of them when frames are slow so they can differ between two runs)
+        """
+        player = self.player
+        projectiles = self.projectiles
+        count = projectiles.count
+        return hash_state((
+            self.ticks, self.level, self.dead, self.transition, self.screenshake, tuple(self.scroll),
+            tuple(player.pos), tuple(player.velocity), player.air_time, player.jumps, player.dashing, player.wall_slide, player.flip, player.action,
+            tuple((tuple(enemy.pos), tuple(enemy.velocity), enemy.walking, enemy.flip, enemy.action) for enemy in self.enemies),
+            tuple(projectiles.xs[:count]), tuple(projectiles.ys[:count]), tuple(projectiles.directions[:count]), tuple(projectiles.timers[:count]),
+        ))
+
+    def quit(self):
+        # writes out what is waiting to be saved, then closes the game
+        self.profiler.save()
+        if self.recorder:
+            self.recorder.save(self.record_path)
+        if self.replay:
+            self.print_replay()
+        pygame.quit()
+        sys.exit()
+
+    def print_replay(self):
+        if self.replay.mismatch is None:
+            print('replay matches:', self.replay.checked, 'ticks checked')
+        else:
+            print('replay went different at tick', self.replay.mismatch, '(' + str(self.replay.checked), 'ticks checked)')
+
+    def pool_stats(self):
+        # how much the pools get reused, and how many effects are alive right now
+        return {
+            'animation': self.animation_pool.stats(),
+            'particles': len(self.particles),
+            'sparks': len(self.sparks),
+            'projectiles': len(self.projectiles),
+            'projectiles_dropped': self.projectiles.dropped,
+        }
+
     def load_level(self, map_id):
         self.dead = 0
         self.transition = -30
-        self.tilemap.load('data/maps/' + str(map_id) + '.json')
-
-        # hardcoding a hit box because there is only one type of tile that can spawn leaves
-        self.leaf_spawners = []
-        for tree in self.tilemap.extract([('large_decor', 2)], keep=True):
-            self.leaf_spawners.append(pygame.Rect(4 + tree['pos'][0], 4 + tree['pos'][1], 23, 13))
-        
+        # new level -> nothing to draw in between, don't slide across the map
+        self.previous = None
+
+        # streamed levels aren't cached, most of their tiles are not in memory to save
+        level = None if self.streaming else self.level_cache.get(map_id)
+        if level:
+            # been here before (you died) -> go back to the saved tiles, no file, no extract
+            self.tilemap.restore(level['tilemap'])
+        else:
+            self.tilemap.load(self.level_path(map_id), stream=self.streaming)
+
+            # hardcoding a hit box because there is only one type of tile that can spawn leaves
+            leaf_spawners = []
+            for tree in self.tilemap.extract([('large_decor', 2)], keep=True):
+                leaf_spawners.append(pygame.Rect(4 + tree['pos'][0], 4 + tree['pos'][1], 23, 13))
+
+            # spawn, no keep because we don't want it on tilemap. just need location
+            spawners = self.tilemap.extract([('spawners', 0), ('spawners', 1)])
+
+            level = {'leaf_spawners': leaf_spawners, 'spawners': spawners}
+            if not self.streaming:
+                level['tilemap'] = self.tilemap.snapshot()
+                self.level_cache.put(map_id, level)
+
+        self.leaf_spawners = level['leaf_spawners']
+        # only the trees near the camera drop leaves
+        self.leaf_scheduler = SpawnScheduler(self.leaf_spawners, chance_divisor=49999, reach=128, lifetime=360, rng=self.rng.leaves)
+
+        # the old enemies are gone, their animations can be reused
+        for enemy in self.enemies:
+            enemy.release()
         self.enemies = []
-        # spawn, no keep because we don't want it on tilemap. just need location
-        for spawner in self.tilemap.extract([('spawners', 0), ('spawners', 1)]):
+        for spawner in level['spawners']:
             if spawner['variant'] == 0:
-                self.player.pos = spawner['pos']
+                # copy, the player moves its pos around and the cache needs the spawn point
+                self.player.pos = list(spawner['pos'])
                 self.player.air_time = 0
             else:
                 self.enemies.append(Enemy(self, spawner['pos'], (8, 15)))
@@ -125,240 +302,393 @@ class Game:
         pygame.mixer.music.play(-1)
         self.sfx['ambience'].play(-1)
 
+        # jump/dash pressed on a frame with no tick wait for the next tick
+        pending = None
+        # the first frame runs one tick
+        frame_ms = 1000 / self.timestep.tick_rate
+
         # game loop
         while True:
-            # any object you don't want a outline in goes in display_2
-            # makes display transparent, this gets the outline
-            self.display.fill((0, 0, 0, 0))
-            # this doesn't get the outline
-            self.display_2.blit(self.assets['background'], (0, 0))
-
-            # screenshake value goes down to 0
-            self.screenshake = max(0, self.screenshake - 1)
-
-            """
-            when abs(self.transition) == 0 then you can see everything
-            when abs(self.transition) == 30 then you can't see anything
-             -> you load the level when you can't see anything
-
-            when there is no enemy -> time to transition to next level
-            """
-            if not len(self.enemies):
-                self.transition += 1
-                # if the screen is black -> load new level
-                if self.transition > 30:
-                    # os.listdir('data/maps') -> creates a list in data/maps directory
-                    # min(a, b) -> so the self.level doesn't load level that doesn't exist
-                    self.level = min(self.level + 1, len(os.listdir('data/maps')) - 1)
-                    self.load_level(self.level)
-            if self.transition < 0:
-                self.transition += 1
-
-
-            # timer starts soon as you die
-            # when timer runs out 40 frames -> the level is restarted
-            if self.dead:
+            self.profiler.start()
+            inputs = self.read_inputs()
+            self.profiler.mark('events')
+            if self.replay and self.replay.done(self.ticks):
+                # nothing left to play back
+                self.quit()
+            if pending:
+                inputs['jump'] = inputs['jump'] or pending['jump']
+                inputs['dash'] = inputs['dash'] or pending['dash']
+            pending = inputs
+
+            # as many ticks as the time the last frame took (fixed timestep)
+            for tick in range(self.timestep.advance(frame_ms / 1000)):
+                if self.replay:
+                    # the recorded inputs instead of the keyboard
+                    if self.replay.done(self.ticks):
+                        break
+                    pending = self.replay.inputs_at(self.ticks)
+                self.step(pending)
+                # a jump/dash press only counts once, holding left/right keeps going
+                pending = {'movement': inputs['movement'], 'jump': False, 'dash': False}
+
+            # drawn between the last two ticks
+            self.render(self.timestep.alpha())
+
+            self.profiler.count('entities', len(self.enemies) + 1)
+            self.profiler.count('particles', len(self.particles))
+            self.profiler.count('sparks', len(self.sparks))
+            self.profiler.count('projectiles', len(self.projectiles))
+            self.profiler.count_delta('blits', self.display_queue.blit_count + self.display_2_queue.blit_count)
+            self.profiler.render(self.display_2)
+            self.profiler.mark('overlay')
+
+            # the shake was made for a 640 wide window, bigger windows shake more pixels
+            shake = self.screenshake * self.screen.get_width() / 640
+            screenshake_offset = (self.rng.shake.random() * shake - shake / 2, self.rng.shake.random() * shake - shake / 2)
+            # camera moved -> everything moved, don't bother looking for what changed
+            self.presenter.present(self.display_2, screenshake_offset, full=self.render_scroll != self.last_render_scroll)
+            self.last_render_scroll = self.render_scroll
+            self.profiler.mark('present')
+            self.profiler.end()
+            # limits how often we draw - dynamic sleep, 0 -> as fast as it can
+            frame_ms = self.clock.tick(self.max_fps)
+            # how long the frame took without the sleep
+            self.governor.record(self.clock.get_rawtime())
+
+    def run_headless(self, ticks, inputs=None):
+        """
+        runs the game logic only, no drawing, no sound, no 60 fps limit
+        inputs -> function(tick) that gives the inputs for step(), None to stand still
+        with a replay -> its inputs, ticks is cut to how long the replay is
+        """
+        if self.replay:
+            ticks = min(ticks, len(self.replay.inputs) - self.ticks)
+            inputs = lambda tick: self.replay.inputs_at(self.ticks)
+        for tick in range(ticks):
+            self.profiler.start()
+            self.step(inputs(tick) if inputs else None)
+            self.profiler.end()
+
+    def read_inputs(self):
+        # turns keyboard events into the inputs step() takes
+        inputs = {'movement': self.held_movement, 'jump': False, 'dash': False}
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.quit()
+            if event.type == pygame.KEYDOWN:
+                k = event.key
+                # F3 -> profiler overlay on / off, F4 -> write the profiler trace
+                if k == pygame.K_F3:
+                    self.profiler.toggle()
+                if k == pygame.K_F4:
+                    self.profiler.save()
+                if (k == pygame.K_LEFT or k == pygame.K_a):
+                    inputs['movement'][0] = True
+                if (k == pygame.K_RIGHT or k == pygame.K_d):
+                    inputs['movement'][1] = True
+                if (k == pygame.K_UP or k == pygame.K_w):
+                    inputs['jump'] = True
+                # player dashes when you press x
+                if event.key == pygame.K_x:
+                    inputs['dash'] = True
+            if event.type == pygame.KEYUP:
+                k = event.key
+                if (k == pygame.K_LEFT or k == pygame.K_a):
+                    inputs['movement'][0] = False
+                if (k == pygame.K_RIGHT or k == pygame.K_d):
+                    inputs['movement'][1] = False
+        # a copy, so changing the inputs doesn't change what keys are held
+        inputs['movement'] = self.held_movement.copy()
+        return inputs
+
+    def step(self, inputs=None):
+        """
+        one tick of the game, everything but drawing
+
+        inputs -> {'movement': [left, right], 'jump': bool, 'dash': bool}
+                  None keeps the movement from last tick and doesn't jump or dash
+        """
+        # where things were before this tick, render() draws between this and where they end up
+        self.previous = {'scroll': tuple(self.scroll), 'pos': {entity: tuple(entity.pos) for entity in self.enemies + [self.player]}}
+
+        if inputs:
+            self.movement = list(inputs['movement'])
+            if inputs['jump']:
+                # jumps
+                # velocity is pointing upwards -> anti-gravity
+                if self.player.jump():
+                    # plays the jump sound
+                    self.sfx['jump'].play()
+            if inputs['dash']:
+                self.player.dash()
+
+        # screenshake value goes down to 0
+        self.screenshake = max(0, self.screenshake - 1)
+
+        """
+        when abs(self.transition) == 0 then you can see everything
+        when abs(self.transition) == 30 then you can't see anything
+         -> you load the level when you can't see anything
+
+        when there is no enemy -> time to transition to next level
+        """
+        if not len(self.enemies):
+            self.transition += 1
+            # if the screen is black -> load new level
+            if self.transition > 30:
+                # level_count() -> how many maps are in data/maps directory
+                # min(a, b) -> so the self.level doesn't load level that doesn't exist
+                self.level = min(self.level + 1, self.level_count() - 1)
+                self.load_level(self.level)
+        if self.transition < 0:
+            self.transition += 1
+
+
+        # timer starts soon as you die
+        # when timer runs out 40 frames -> the level is restarted
+        if self.dead:
+            self.dead += 1
+            # locks the current level when you die so you don't go to the next level
+            # stays on the level you died for a while then restarts the level
+            if self.dead == 10:
+                self.transition = min(30, self.transition + 1)
+            # loads the level again
+            if self.dead > 40:
+                self.load_level(self.level)
+        
+        # how far the camera is from where we want it to be
+        # gets the place where player will be at the center
+        # self.player.rect().centerx - self.display.get_width() / 2
+
+        # were the camera is at right now
+        # ... - self.scroll[0]
+
+        # add it to the scroll
+        # self.scroll[0] += ...
+
+        # further the player is, the faster the camera will move
+        # / 30
+        self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 30
+        self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 30
+        # removes jitter on the player
+        render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
+
+        # streamed levels: page in the chunks around the camera, keep the ones entities stand on
+        self.tilemap.update_stream(render_scroll, self.display.get_size(), [enemy.pos for enemy in self.enemies] + [self.player.pos])
+        
+        # each tree has a chance of area / 49999 to drop a leaf each frame
+        # the ones far from the camera are skipped, leaves from there can't reach the screen
+        view = pygame.Rect(render_scroll[0], render_scroll[1], self.display.get_width(), self.display.get_height())
+        for pos, age in self.leaf_scheduler.update(view):
+            # drawn even for leaves the governor drops, so the leaves stream doesn't
+            # depend on how fast the game runs (replays)
+            frame = self.rng.leaves.randint(0, 20)
+            # leaves are the first effect to go when the game runs slow
+            if not self.governor.leaf(len(self.particles), self.rng.governor.random):
+                continue
+            # spawns our particles
+            # age -> trees that just came near the camera get the leaves they would have dropped already
+            self.particles.add('leaf', pos, velocity=[-0.1, 0.3], 
+                               frame=frame, age=age)
+        self.profiler.mark('update.level')
+        
+        # update clouds
+        self.clouds.update()
+        self.profiler.mark('update.clouds')
+
+        # all the enemies decide where to walk, then move together in one collision batch
+        movements = [enemy.walk(self.tilemap, (0, 0)) for enemy in self.enemies]
+        PhysicsEntity.update_all(self.enemies, self.tilemap, movements)
+        for enemy, movement in list(zip(self.enemies, movements)):
+            kill = enemy.after_move(movement)
+            if kill:
+                self.enemies.remove(enemy)
+                enemy.release()
+        self.profiler.mark('update.enemies')
+
+        # update player
+        if not self.dead:
+            self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
+        self.profiler.mark('update.player')
+
+        # if you are in cooldown part of dashing or not dashing the projectiles can hit you
+        # if you dash, you are invincible
+        player_rect = self.player.rect() if abs(self.player.dashing) < 50 else None
+        # moves the projectiles, removes the ones that hit something or flew off the map
+        for hit in self.projectiles.update(self.tilemap, player_rect):
+            if hit['type'] == 'wall':
+                # spark go off when projectile hits a solid tile (wall)
+                # spawns 4 sparks
+                for i in range(self.governor.burst(4, 'sparks', len(self.sparks))):
+                    # (math.pi if direction > 0 else 0)
+                    # -> shoot the spark left only if the projectile is going right, vice versa
+                    self.sparks.add(hit['pos'], self.rng.effects.random() - 0.5 + (math.pi if hit['direction'] > 0 else 0), 2 + self.rng.effects.random())
+            else:
+                # when player is hit by projectile
                 self.dead += 1
-                # locks the current level when you die so you don't go to the next level
-                # stays on the level you died for a while then restarts the level
-                if self.dead == 10:
-                    self.transition = min(30, self.transition + 1)
-                # loads the level again
-                if self.dead > 40:
-                    self.load_level(self.level)
-            
-            # how far the camera is from where we want it to be
-            # gets the place where player will be at the center
-            # self.player.rect().centerx - self.display.get_width() / 2
-
-            # were the camera is at right now
-            # ... - self.scroll[0]
-
-            # add it to the scroll
-            # self.scroll[0] += ...
-
-            # further the player is, the faster the camera will move
-            # / 30
-            self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 30
-            self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 30
-            # removes jitter on the player
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-            
-            for rect in self.leaf_spawners:
-                if random.random() * 49999 < rect.width * rect.height:
-                    # gives us any position in the rect
-                    pos = (rect.x + random.random() * rect.width, rect.y + random.random() * rect.height)
-                    # spawns our particles
-                    self.particles.append(Particle(self, 'leaf', pos, velocity=[-0.1, 0.3], 
-                                                   frame=random.randint(0, 20)))
-            
-            # update and render clouds
-            self.clouds.update()
-            self.clouds.render(self.display_2, offset=render_scroll)
-            
-            # update and render tile map
-            self.tilemap.render(self.display, offset=render_scroll)
-            
-            # want to render the tiles before the player
-            # so the tile doesn't hide the player
-
-            # want to render enemies before player
-            for enemy in self.enemies.copy():
-                kill = enemy.update(self.tilemap, (0, 0))
-                enemy.render(self.display, offset=render_scroll)
-
-                if kill:
-                    self.enemies.remove(enemy)
-
-            # update and render player
-            if not self.dead:
-                self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
-                self.player.render(self.display, offset=render_scroll)
-
-            # want the projectiles to be on top of the player
-            # [(x, y), direction, timer]
-            for projectile in self.projectiles.copy():
-                projectile[0][0] += projectile[1]
-                projectile[2] += 1
-                img = self.assets['projectile']
-                # adding projectile on the display
-                # img.get_width() / 2 = top center
-                # render_scroll -> to apply the camera
-                # if the projectile doesn't appear, you got the camera stuff wrong
-                # think about how the camera should apply to the thing you are working on
-                self.display.blit(img, (projectile[0][0] - img.get_width() / 2 - render_scroll[0], projectile[0][1] - img.get_height() / 2 - render_scroll[1]))
-
-                # check if the location of the projectile is a solid tile (wall)
-                if self.tilemap.solid_check(projectile[0]):
-                    # if it hits the wall, we remove it
-                    self.projectiles.remove(projectile)
-
-                    # spark go off when projectile hits a solid tile (wall)
-                    # spawns 4 sparks
-                    for i in range(4):
-                        # (math.pi if projectile[1] > 0 else 0)
-                        # -> shoot the spark left only if the projectile is going right, vice versa
-                        self.sparks.append(Spark(projectile[0], random.random() - 0.5 + (math.pi if projectile[1] > 0 else 0), 2 + random.random()))
-
-                # if time is greater than 6 secs, we remove the porjectile
-                # when the projectile flies off the map
-                elif projectile[2] > 360:
-                    self.projectiles.remove(projectile)
-
-                # if it hits the player
-                # if you are in cooldown part of dashing or not dashing
-                # if you dash, you are invincible
-                elif abs(self.player.dashing) < 50:
-                    # if the projectile hits the player
-                    if self.player.rect().collidepoint(projectile[0]):
-                        self.projectiles.remove(projectile)
-                        # when player is hit by projectile
-                        self.dead += 1
-
-                        # plays the hit sound when player gets hit
-                        self.sfx['hit'].play()
-
-                        # when player gets shot, screen shake is applied
-                        self.screenshake = max(16, self.screenshake)
-
-                        # spark go off when projectile hits a player
-                        # # spawns 30 sparks
-                        for i in range(30):
-                            # gives random angle in a circle in radians
-                            angle = random.random() * math.pi * 2
-                            speed = random.random() * 5
-                            self.sparks.append(Spark(self.player.rect().center, angle, 2 + random.random()))
-
-                            # add particles -> 30 particles as well
-                            self.particles.append(Particle(self, 'particle', self.player.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-    
-            # sparks is below particles
-            for spark in self.sparks.copy():
-                kill = spark.update()
-                spark.render(self.display, offset=render_scroll)
-                if kill:
-                    self.sparks.remove(spark)
-
-            # don't want sparks and particles to have the outline so outline code below
-
-            # creating a mask from the display where we render everything that we want to have a outline
-            # mask is image with two color (black and white)
-            # can do binary operation on them
-            # we use it convert something that has multiple colors to only two colors
-            display_mask =  pygame.mask.from_surface(self.display)
-            
-            # creates outline of what is on the surface
-            # (r, g, b, alpha) alpha = transperency, 0 is fully transparent
-            display_sillhouette = display_mask.to_surface(setcolor=(0,0,0,180), unsetcolor=(0,0,0,0))
-            for offset in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                # puts the outline on each image being rendered
-                self.display_2.blit(display_sillhouette, offset)
-
-            for particle in self.particles.copy():
-                kill = particle.update()
-                particle.render(self.display, offset=render_scroll)
-                if particle.type == 'leaf':
-                    # passing in animation frame to sin function
-                    # sin() gives a num between [-1, 1]
-                    # makes the particle move back and forth over time in smooth pattern
-                    # 0.035 is to slow down the sin function so you don't loop fast
-                    particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
-                if kill:
-                    self.particles.remove(particle)
-            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.KEYDOWN:
-                    k = event.key
-                    if (k == pygame.K_LEFT or k == pygame.K_a):
-                        self.movement[0] = True
-                    if (k == pygame.K_RIGHT or k == pygame.K_d):
-                        self.movement[1] = True
-                    if (k == pygame.K_UP or k == pygame.K_w):
-                        # jumps
-                        # velocity is pointing upwards -> anti-gravity
-                        if self.player.jump():
-                            # plays the jump sound
-                            self.sfx['jump'].play()
-                    # player dashes when you press x
-                    if event.key == pygame.K_x:
-                        self.player.dash()
-                if event.type == pygame.KEYUP:
-                    k = event.key
-                    if (k == pygame.K_LEFT or k == pygame.K_a):
-                        self.movement[0] = False
-                    if (k == pygame.K_RIGHT or k == pygame.K_d):
-                        self.movement[1] = False
-            
-            # only runs when you have beat the level
-            if self.transition:
-                # creates a surface that is black and size of the display
-                transition_surf = pygame.Surface(self.display.get_size())
-
-                # draws a circle on the transition_surf surface,color -> white
-                # center of the circle -> (...//2, ...//2)
-                # radius -> (30 - abs(self.transition)) * 8
-                pygame.draw.circle(transition_surf, (255, 255, 255), (self.display.get_width() // 2, self.display.get_height() // 2), (30 - abs(self.transition)) * 8)
-                
-                # ignores the white color
-                # so the circle color is white and if it ignores the white color,
-                # you will see what is behind it
-                transition_surf.set_colorkey((255, 255, 255))
-                
-                # put the surface on the actual display of the game
-                self.display.blit(transition_surf, (0, 0))
-
-            # put eveything without an outline on display_2
-            self.display_2.blit(self.display, (0, 0))
-            screenshake_offset = (random.random() * self.screenshake - self.screenshake / 2, random.random() * self.screenshake - self.screenshake / 2)
-            # we first scale the display with pygame.transform.scale to fit the screen
-            # we put the scaled display on top of the screen
-            self.screen.blit(pygame.transform.scale(self.display_2, self.screen.get_size()), screenshake_offset)
-            # this updates the screen
-            pygame.display.update()
-            # runs game at 60 fps - dynamic sleep
-            self.clock.tick(60)
-
-Game().run()
\ No newline at end of file
+
+                # plays the hit sound when player gets hit
+                self.sfx['hit'].play()
+
+                # when player gets shot, screen shake is applied
+                self.screenshake = max(16, self.screenshake)
+
+                # spark go off when projectile hits a player
+                # # spawns 30 sparks (fewer when the governor says the game is slow)
+                spark_count = self.governor.burst(30, 'sparks', len(self.sparks))
+                particle_count = self.governor.burst(30, 'particles', len(self.particles))
+                for i in range(max(spark_count, particle_count)):
+                    # gives random angle in a circle in radians
+                    angle = self.rng.effects.random() * math.pi * 2
+                    speed = self.rng.effects.random() * 5
+                    if i < spark_count:
+                        self.sparks.add(player_rect.center, angle, 2 + self.rng.effects.random())
+
+                    # add particles -> 30 particles as well
+                    if i < particle_count:
+                        self.particles.add('particle', player_rect.center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=self.rng.effects.randint(0, 7))
+        self.profiler.mark('update.projectiles')
+
+        # moves the sparks and takes out the ones that stopped
+        self.sparks.update()
+        self.profiler.mark('update.sparks')
+
+        # moves every particle, sways the leaves and takes out the dead ones
+        self.particles.update()
+        self.profiler.mark('update.particles')
+
+        # recording -> what this tick ran with and what came out, replay -> the same as last time?
+        if self.recorder or self.replay:
+            state_hash = self.state_hash()
+            if self.recorder:
+                self.recorder.record(self.movement, inputs and inputs['jump'], inputs and inputs['dash'], state_hash)
+            if self.replay:
+                self.replay.check(self.ticks, state_hash)
+        self.ticks += 1
+
+    def mark_draw(self, phase):
+        # with the profiler on, draw what was queued right away so the time of the blits
+        # goes to the phase that queued them (same order, same pixels, just less batching)
+        if self.profiler.enabled:
+            self.display_queue.flush()
+            self.display_2_queue.flush()
+            self.profiler.mark(phase)
+
+    def render_offset(self, entity, render_scroll, alpha):
+        # camera offset that draws the entity alpha of the way from where it was last tick to where it is
+        # (moving the offset instead of the entity, render doesn't change the game)
+        prev = self.previous['pos'].get(entity) if self.previous and alpha < 1 else None
+        if not prev:
+            return render_scroll
+        return (render_scroll[0] + (entity.pos[0] - prev[0]) * (1 - alpha),
+                render_scroll[1] + (entity.pos[1] - prev[1]) * (1 - alpha))
+
+    # alpha -> how far between the last two ticks to draw, 1 -> the current state
+    def render(self, alpha=1.0):
+        # draws the current state of the game onto display and display_2
+        # any object you don't want a outline in goes in display_2
+        # makes display transparent, this gets the outline
+        self.display.fill((0, 0, 0, 0))
+        # this doesn't get the outline
+        self.display_2.blit(self.assets['background'], (0, 0))
+        self.mark_draw('draw.background')
+
+        scroll = self.scroll
+        if self.previous and alpha < 1:
+            prev = self.previous['scroll']
+            scroll = (prev[0] + (scroll[0] - prev[0]) * alpha, prev[1] + (scroll[1] - prev[1]) * alpha)
+        # removes jitter on the player
+        render_scroll = (int(scroll[0]), int(scroll[1]))
+        self.render_scroll = render_scroll
+
+        # sprites go in display_queue (-> display), outlines and clouds in display_2_queue (-> display_2)
+        sprites = self.display_queue
+        back = self.display_2_queue
+
+        self.clouds.render(back, offset=render_scroll)
+        self.mark_draw('draw.clouds')
+        
+        # everything with an outline draws its sprite on display and its outline on display_2
+        # the outlines are made once per sprite (outline.py), not from the whole screen every frame
+
+        # render tile map
+        self.tilemap.render(sprites, offset=render_scroll, outline=back)
+        self.mark_draw('draw.tilemap')
+        
+        # want to render the tiles before the player
+        # so the tile doesn't hide the player
+
+        # want to render enemies before player
+        for enemy in self.enemies:
+            enemy.render(sprites, offset=self.render_offset(enemy, render_scroll, alpha), outline=back)
+
+        if not self.dead:
+            self.player.render(sprites, offset=self.render_offset(self.player, render_scroll, alpha), outline=back)
+        self.mark_draw('draw.entities')
+
+        # want the projectiles to be on top of the player
+        # adding projectiles on the display
+        # render_scroll -> to apply the camera
+        self.projectiles.render(sprites, self.assets['projectile'], offset=render_scroll, outline=back)
+        self.mark_draw('draw.projectiles')
+
+        # sparks are drawn with pygame.draw, everything queued before them has to be on display first
+        sprites.flush()
+
+        # sparks is below particles
+        self.sparks.render(self.display, offset=render_scroll, outline=back)
+        self.mark_draw('draw.sparks')
+
+        # don't want particles to have the outline
+        self.particles.render(sprites, offset=render_scroll)
+        sprites.flush()
+        back.flush()
+        self.mark_draw('draw.particles')
+        
+        # only runs when you have beat the level
+        # the circle that shrinks to black / grows to show the level, each size is drawn once
+        if self.transition:
+            self.transition_effect.render(self.display, self.transition)
+
+        # put eveything without an outline on display_2
+        self.display_2.blit(self.display, (0, 0))
+        self.mark_draw('draw.transition')
+
+if __name__ == '__main__':
+    # python game.py --profile            -> profiler overlay on from the start (F3 turns it on and off)
+    # python game.py --trace frames.csv   -> where F4 (and quitting) writes the profiler trace, .csv or .json
+    profile = '--profile' in sys.argv
+    trace_path = sys.argv[sys.argv.index('--trace') + 1] if '--trace' in sys.argv else None
+    # python game.py --seed 42            -> the same random numbers every run
+    # python game.py --record run.rpl     -> saves the inputs of every tick (and the seed) when you quit
+    # python game.py --replay run.rpl     -> plays run.rpl back and says if every tick came out the same
+    #                                        (with --headless, as fast as it can without a window)
+    seed = int(sys.argv[sys.argv.index('--seed') + 1]) if '--seed' in sys.argv else None
+    record_path = sys.argv[sys.argv.index('--record') + 1] if '--record' in sys.argv else None
+    replay_path = sys.argv[sys.argv.index('--replay') + 1] if '--replay' in sys.argv else None
+
+    # python game.py --headless 10000 -> runs 10000 ticks without a window and prints the speed
+    # (with --profile it also prints the average time of each part of a tick)
+    if '--headless' in sys.argv:
+        ticks = int(sys.argv[sys.argv.index('--headless') + 1]) if len(sys.argv) > sys.argv.index('--headless') + 1 and sys.argv[sys.argv.index('--headless') + 1].isdigit() else 10000
+        game = Game(headless=True, profile=profile, trace_path=trace_path, seed=seed, record_path=record_path, replay_path=replay_path)
+        start = time.perf_counter()
+        game.run_headless(ticks)
+        seconds = time.perf_counter() - start
+        print(game.ticks, 'ticks in', round(seconds, 3), 'seconds ->', round(game.ticks / seconds), 'ticks per second')
+        for name, ms in game.profiler.averages().items():
+            print(name, round(ms, 4), 'ms')
+        game.profiler.save()
+        if game.recorder:
+            game.recorder.save(record_path)
+        if game.replay:
+            game.print_replay()
+    else:
+        # python game.py --dirty-rects -> only update the parts of the window that changed
+        # python game.py --scale 3     -> 960x720 window
+        # python game.py --window 1280x720 -> window of any size, the game is stretched to fit
+        # python game.py --scaled      -> SDL scales the game up to the window
+        scale = int(sys.argv[sys.argv.index('--scale') + 1]) if '--scale' in sys.argv else 2
+        window_size = tuple(int(n) for n in sys.argv[sys.argv.index('--window') + 1].split('x')) if '--window' in sys.argv else None
+        Game(dirty_rects='--dirty-rects' in sys.argv, scale=scale, window_size=window_size, scaled='--scaled' in sys.argv,
+             profile=profile, trace_path=trace_path, seed=seed, record_path=record_path, replay_path=replay_path).run()
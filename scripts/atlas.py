@@ -0,0 +1,129 @@
+import pygame
+
+class Atlas:
+    """
+    packs a lot of small images into a few big surfaces (pages)
+    regions[img] -> (page, area rect), blit(page, pos, area) draws the same pixels as blit(img, pos)
+
+    packing is done in shelves: images sorted by height, put left to right in rows,
+    a new row when the page is too narrow, a new page when the page is too short
+
+    only images with the game's black colorkey go in (load_image), the pages use the same colorkey
+    images bigger than a page stay on their own
+    (the game leaves the background out too, it is never drawn through a DrawQueue)
+    """
+    def __init__(self, page_size=512):
+        self.page_size = page_size
+        self.pages = []
+        self.regions = {}
+
+    def __len__(self):
+        return len(self.regions)
+
+    def __contains__(self, img):
+        return img in self.regions
+
+    def fits(self, img):
+        if img.get_flags() & pygame.SRCALPHA or img.get_colorkey() != (0, 0, 0, 255):
+            return False
+        return img.get_width() <= self.page_size and img.get_height() <= self.page_size
+
+    def build(self, images):
+        # images -> any images, the ones that don't fit or are already packed are skipped
+        todo = []
+        seen = set()
+        for img in images:
+            if img not in seen and img not in self.regions and self.fits(img):
+                seen.add(img)
+                todo.append(img)
+        todo.sort(key=lambda img: (-img.get_height(), -img.get_width()))
+
+        # where the next image goes: page, x, y, height of the row
+        page = -1
+        x = y = row_height = 0
+        placed = []
+        for img in todo:
+            w, h = img.get_size()
+            if page >= 0 and x + w > self.page_size:
+                # next row
+                x = 0
+                y += row_height
+                row_height = 0
+            if page < 0 or y + h > self.page_size:
+                # next page
+                page += 1
+                x = y = row_height = 0
+            placed.append((page, pygame.Rect(x, y, w, h), img))
+            x += w
+            row_height = max(row_height, h)
+
+        for i in range(page + 1):
+            used = [(area, img) for p, area, img in placed if p == i]
+            # each page only as big as it has to be
+            size = (max(area.right for area, img in used), max(area.bottom for area, img in used))
+            # same pixel format as the images so blits don't have to convert
+            surf = pygame.Surface(size, 0, used[0][1])
+            surf.fill((0, 0, 0))
+            surf.set_colorkey((0, 0, 0))
+            for area, img in used:
+                surf.blit(img, area)
+                self.regions[img] = (surf, area)
+            self.pages.append(surf)
+        return len(placed)
+
+class DrawQueue:
+    """
+    collects blits for one surface and hands them all to Surface.blits() in one call (flush)
+    anything that draws with surf.blit() / surf.blits() can be given a DrawQueue instead of the surface
+
+    images in the atlas are swapped for (page, pos, area)
+
+    things that can't wait (pygame.draw, reading pixels) need flush() first so the order stays the same
+    """
+    def __init__(self, target, atlas=None):
+        self.target = target
+        self.atlas = atlas
+        self.items = []
+
+        # blits sent and flush calls, for profiling
+        self.blit_count = 0
+        self.flush_count = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def get_width(self):
+        return self.target.get_width()
+
+    def get_height(self):
+        return self.target.get_height()
+
+    def get_size(self):
+        return self.target.get_size()
+
+    def blit(self, img, pos, area=None):
+        region = self.atlas.regions.get(img) if self.atlas and area is None else None
+        if region:
+            self.items.append((region[0], pos, region[1]))
+        elif area is None:
+            self.items.append((img, pos))
+        else:
+            self.items.append((img, pos, area))
+
+    def blits(self, blit_sequence, doreturn=True):
+        regions = self.atlas.regions if self.atlas else {}
+        items = self.items
+        for blit in blit_sequence:
+            # (img, pos) with img in the atlas -> (page, pos, area), anything else goes as it is
+            if len(blit) == 2 and blit[0] in regions:
+                region = regions[blit[0]]
+                items.append((region[0], blit[1], region[1]))
+            else:
+                items.append(blit)
+
+    def flush(self):
+        if self.items:
+            self.target.blits(self.items, doreturn=False)
+            self.blit_count += len(self.items)
+            self.flush_count += 1
+            self.items = []
@@ -0,0 +1,133 @@
+try:
+    from scripts.chunkgrid import CHUNK_SHIFT, CHUNK_MASK, CHUNK_CELLS, EMPTY
+except ModuleNotFoundError:
+    from chunkgrid import CHUNK_SHIFT, CHUNK_MASK, CHUNK_CELLS, EMPTY
+
+# one bit per neighbour that has the same tile type
+RIGHT = 1
+LEFT = 2
+UP = 4
+DOWN = 8
+NEIGHBOR_BITS = [((1, 0), RIGHT), ((-1, 0), LEFT), ((0, -1), UP), ((0, 1), DOWN)]
+
+def build_table(autotile_map):
+    """
+    turns {sorted neighbour tuple: variant} (AUTOTILE_MAP) into a list of 16
+    table[mask] = variant, or -1 when the tile should be left alone
+    """
+    table = []
+    for mask in range(16):
+        neighbors = tuple(sorted(shift for shift, bit in NEIGHBOR_BITS if mask & bit))
+        table.append(autotile_map.get(neighbors, -1))
+    return table
+
+class Autotiler:
+    """
+    picks the variant of grass/stone tiles from which neighbours have the same type
+
+    full()   -> every tile of the map, a chunk at a time
+    update() -> only tiles around the ones that changed since last time (mark())
+                cheap enough to run every frame while painting in the editor
+    """
+    def __init__(self, tilemap, autotile_map, autotile_types):
+        self.tilemap = tilemap
+        self.table = build_table(autotile_map)
+        self.types = set(autotile_types)
+        # grid locations that changed since the last update()/full()
+        self.dirty = set()
+
+    def mark(self, x, y):
+        self.dirty.add((x, y))
+
+    def clear(self):
+        self.dirty = set()
+
+    def type_ids(self):
+        # packed tiles keep type id + 1 in the high byte, compare that instead of names
+        grid = self.tilemap.tilemap
+        return {grid.type_ids[tile_type] + 1 for tile_type in self.types if tile_type in grid.type_ids}
+
+    def set_variant(self, x, y, packed, variant):
+        # straight into the grid, a new variant doesn't change what the neighbours see
+        grid = self.tilemap.tilemap
+        grid.set(x, y, grid.types[(packed >> 8) - 1], variant)
+        self.tilemap.cache.invalidate_tile(x, y)
+
+    def update(self):
+        # a changed tile changes the mask of its 4 neighbours too
+        cells = set()
+        for x, y in self.dirty:
+            cells.add((x, y))
+            for shift, bit in NEIGHBOR_BITS:
+                cells.add((x + shift[0], y + shift[1]))
+        self.dirty = set()
+
+        grid = self.tilemap.tilemap
+        get = grid.get
+        table = self.table
+        ids = self.type_ids()
+        for x, y in cells:
+            packed = get(x, y)
+            tile_id = packed >> 8
+            if tile_id not in ids:
+                continue
+            mask = 0
+            if get(x + 1, y) >> 8 == tile_id:
+                mask |= RIGHT
+            if get(x - 1, y) >> 8 == tile_id:
+                mask |= LEFT
+            if get(x, y - 1) >> 8 == tile_id:
+                mask |= UP
+            if get(x, y + 1) >> 8 == tile_id:
+                mask |= DOWN
+            variant = table[mask]
+            if variant >= 0 and variant != packed & 0xFF:
+                self.set_variant(x, y, packed, variant)
+
+    def full(self):
+        """
+        whole map, works on each chunk array directly
+        neighbours inside the chunk are just index + 1, - 1, + CHUNK_SIZE, - CHUNK_SIZE
+        only the cells on the chunk border have to ask the grid
+        """
+        self.dirty = set()
+        grid = self.tilemap.tilemap
+        get = grid.get
+        table = self.table
+        ids = self.type_ids()
+        size = CHUNK_MASK + 1
+        changes = []
+        for key, chunk in grid.chunks.items():
+            base_x = key[0] << CHUNK_SHIFT
+            base_y = key[1] << CHUNK_SHIFT
+            for i in range(CHUNK_CELLS):
+                packed = chunk[i]
+                if packed == EMPTY:
+                    continue
+                tile_id = packed >> 8
+                if tile_id not in ids:
+                    continue
+                local_x = i & CHUNK_MASK
+                local_y = i >> CHUNK_SHIFT
+                x = base_x + local_x
+                y = base_y + local_y
+                right = chunk[i + 1] if local_x < CHUNK_MASK else get(x + 1, y)
+                left = chunk[i - 1] if local_x > 0 else get(x - 1, y)
+                up = chunk[i - size] if local_y > 0 else get(x, y - 1)
+                down = chunk[i + size] if local_y < CHUNK_MASK else get(x, y + 1)
+                mask = 0
+                if right >> 8 == tile_id:
+                    mask |= RIGHT
+                if left >> 8 == tile_id:
+                    mask |= LEFT
+                if up >> 8 == tile_id:
+                    mask |= UP
+                if down >> 8 == tile_id:
+                    mask |= DOWN
+                variant = table[mask]
+                if variant >= 0 and variant != packed & 0xFF:
+                    changes.append((x, y, packed, variant))
+
+        # after the loop, set() can copy chunks (snapshots) or add them
+        for x, y, packed, variant in changes:
+            self.set_variant(x, y, packed, variant)
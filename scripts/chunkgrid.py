@@ -0,0 +1,235 @@
+import sys
+from array import array
+
+# chunks are CHUNK_SIZE x CHUNK_SIZE tiles
+# power of 2 so we can find the chunk and the cell with shifts and masks instead of division
+CHUNK_SHIFT = 4
+CHUNK_SIZE = 1 << CHUNK_SHIFT
+CHUNK_MASK = CHUNK_SIZE - 1
+CHUNK_CELLS = CHUNK_SIZE * CHUNK_SIZE
+
+# a cell holds one packed 16 bit number
+# 0                        -> empty cell
+# (type id + 1) << 8 | variant -> a tile
+EMPTY = 0
+
+def chunk_key(x, y):
+    # >> floors for negative numbers too, -1 >> 4 = -1
+    return (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+
+def cell_index(x, y):
+    return ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+
+class ChunkGrid:
+    """
+    on grid tiles stored by integer coordinates
+
+    before:
+    {'3;5': {'type': 'grass', 'variant': 1, 'pos': [3, 5]}, ...}
+    every lookup had to build the 'x;y' string and hash it
+
+    now:
+    {(0, 0): array of 256 packed tiles, (1, 0): ..., ...}
+    a lookup is a tuple of ints into the chunk dict and then an index into the array
+    """
+    def __init__(self, solid_types=()):
+        # (chunk x, chunk y) -> array('H') of CHUNK_CELLS packed tiles
+        self.chunks = {}
+        # (chunk x, chunk y) -> bytearray of CHUNK_CELLS, 1 where the tile is solid (physics tile)
+        # kept in sync with chunks so collisions don't need to look at tile types
+        self.solid_chunks = {}
+        self.solid_types = set(solid_types)
+        # how many tiles are in each chunk so empty chunks can be thrown away
+        self.counts = {}
+        # chunks whose arrays are shared with a snapshot, copied before we change them
+        self.shared = set()
+        # palette of tile types, the packed id stores the index into this list
+        self.types = []
+        self.type_ids = {}
+        # solid flag for each type in the palette
+        self.type_solid = bytearray()
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def __contains__(self, loc):
+        return self.get(loc[0], loc[1]) != EMPTY
+
+    def type_id(self, tile_type):
+        # adds new tile types to the palette the first time we see them
+        if tile_type not in self.type_ids:
+            self.type_ids[tile_type] = len(self.types)
+            self.types.append(tile_type)
+            self.type_solid.append(tile_type in self.solid_types)
+        return self.type_ids[tile_type]
+
+    def pack(self, tile_type, variant):
+        return ((self.type_id(tile_type) + 1) << 8) | variant
+
+    def unpack(self, packed):
+        # (type, variant)
+        return self.types[(packed >> 8) - 1], packed & 0xFF
+
+    def get(self, x, y):
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is None:
+            return EMPTY
+        return chunk[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+
+    def solid(self, x, y):
+        # 1 if there is a solid tile at x, y else 0
+        chunk = self.solid_chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is None:
+            return 0
+        return chunk[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+
+    # returns True if the cell changed
+    def set(self, x, y, tile_type, variant):
+        key = chunk_key(x, y)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = array('H', bytes(CHUNK_CELLS * 2))
+            self.solid_chunks[key] = bytearray(CHUNK_CELLS)
+            self.counts[key] = 0
+        i = cell_index(x, y)
+        packed = self.pack(tile_type, variant)
+        if chunk[i] == packed:
+            return False
+        if key in self.shared:
+            chunk = self.own(key)
+        if chunk[i] == EMPTY:
+            self.counts[key] += 1
+        chunk[i] = packed
+        self.solid_chunks[key][i] = self.type_solid[(packed >> 8) - 1]
+        return True
+
+    def remove(self, x, y):
+        key = chunk_key(x, y)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            return False
+        i = cell_index(x, y)
+        if chunk[i] == EMPTY:
+            return False
+        if key in self.shared:
+            chunk = self.own(key)
+        chunk[i] = EMPTY
+        self.solid_chunks[key][i] = 0
+        self.counts[key] -= 1
+        # don't keep chunks around that have nothing in them
+        if not self.counts[key]:
+            del self.chunks[key]
+            del self.solid_chunks[key]
+            del self.counts[key]
+        return True
+
+    def own(self, key):
+        # copy on write, make our own copy of a chunk a snapshot is also using
+        self.chunks[key] = array('H', self.chunks[key])
+        self.solid_chunks[key] = bytearray(self.solid_chunks[key])
+        self.shared.discard(key)
+        return self.chunks[key]
+
+    def snapshot(self):
+        """
+        a copy of the grid that is cheap to make
+        both grids use the same chunk arrays until one of them changes a chunk
+        then that one copies just that chunk (copy on write)
+        """
+        grid = ChunkGrid(self.solid_types)
+        grid.chunks = dict(self.chunks)
+        grid.solid_chunks = dict(self.solid_chunks)
+        grid.counts = dict(self.counts)
+        grid.types = list(self.types)
+        grid.type_ids = dict(self.type_ids)
+        grid.type_solid = bytearray(self.type_solid)
+        grid.shared = set(self.chunks)
+        self.shared = set(self.chunks)
+        return grid
+
+    def tile(self, x, y):
+        # builds the same tile dict the json map uses
+        # it is a new dict, changing it doesn't change the grid -> use set()
+        packed = self.get(x, y)
+        if packed == EMPTY:
+            return None
+        tile_type, variant = self.unpack(packed)
+        return {'type': tile_type, 'variant': variant, 'pos': [x, y]}
+
+    def load_all(self):
+        # every chunk in memory -> a plain grid always has all of them (see StreamedGrid)
+        pass
+
+    def items(self):
+        # (x, y, packed) for every tile
+        # list so the grid can be changed while looping over the result
+        tiles = []
+        for key in self.chunks:
+            tiles.extend(self.chunk_items(key))
+        return tiles
+
+    def chunk_items(self, key):
+        # (x, y, packed) for every tile in one chunk
+        tiles = []
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            return tiles
+        base_x = key[0] << CHUNK_SHIFT
+        base_y = key[1] << CHUNK_SHIFT
+        for i, packed in enumerate(chunk):
+            if packed != EMPTY:
+                tiles.append((base_x + (i & CHUNK_MASK), base_y + (i >> CHUNK_SHIFT), packed))
+        return tiles
+
+    def clear(self):
+        self.chunks = {}
+        self.solid_chunks = {}
+        self.counts = {}
+        self.shared = set()
+        self.types = []
+        self.type_ids = {}
+        self.type_solid = bytearray()
+
+    # the binary level format (see levelfile.py)
+    # cells are already packed with the indexes of types
+    # {(chunk x, chunk y): CHUNK_CELLS packed cells} - arrays or memoryviews of a mapped file
+    def load_chunks(self, types, chunks):
+        self.clear()
+        for tile_type in types:
+            self.type_id(tile_type)
+        for key, cells in chunks.items():
+            self.add_chunk(key, cells)
+
+    # put a whole chunk of packed cells (palette already set up) into the grid
+    def add_chunk(self, key, cells):
+        # the high byte of a packed cell is type id + 1 (0 for empty cells)
+        # so the solid mask is the high bytes run through a table
+        solid_table = (bytes(1) + bytes(self.type_solid)).ljust(256, bytes(1))
+        raw = cells.tobytes()
+        high = raw[1::2] if sys.byteorder == 'little' else raw[0::2]
+        count = CHUNK_CELLS - high.count(0)
+        if count:
+            self.chunks[key] = cells
+            self.solid_chunks[key] = bytearray(high.translate(solid_table))
+            self.counts[key] = count
+            self.shared.discard(key)
+
+    def drop_chunk(self, key):
+        self.chunks.pop(key, None)
+        self.solid_chunks.pop(key, None)
+        self.counts.pop(key, None)
+        self.shared.discard(key)
+
+    # the json map format
+    # {'x;y': {'type': ..., 'variant': ..., 'pos': [x, y]}}
+    def load_dict(self, tilemap):
+        self.clear()
+        for tile in tilemap.values():
+            self.set(int(tile['pos'][0]), int(tile['pos'][1]), tile['type'], tile['variant'])
+
+    def to_dict(self):
+        tilemap = {}
+        for x, y, packed in self.items():
+            tile_type, variant = self.unpack(packed)
+            tilemap[str(x) + ';' + str(y)] = {'type': tile_type, 'variant': variant, 'pos': [x, y]}
+        return tilemap
@@ -33,16 +33,17 @@ class Cloud:
         
 
 class Clouds:
-    def __init__(self, cloud_images, count=16):
+    # rng -> where the random numbers come from, the random module or a random.Random
+    def __init__(self, cloud_images, count=16, rng=random):
         # set of clouds
         self.clouds = []
 
         for i in range(count):
-            self.clouds.append(Cloud((random.random() * 99999, # x
-                                      random.random() * 99999), # y
-                                      random.choice(cloud_images),  # cloud image
-                                      random.random() * 0.05 + 0.05, # speed of cloud
-                                      random.random() * 0.6 + 0.2)) # depth of cloud
+            self.clouds.append(Cloud((rng.random() * 99999, # x
+                                      rng.random() * 99999), # y
+                                      rng.choice(cloud_images),  # cloud image
+                                      rng.random() * 0.05 + 0.05, # speed of cloud
+                                      rng.random() * 0.6 + 0.2)) # depth of cloud
                                         # cloud in foreground move faster than the background
 
             # sorting cloud by depth
@@ -2,20 +2,23 @@ import sys
 import pygame
 from utils import load_images, Animation
 from tilemap import Tilemap
+from present import Presenter, create_screen
 
-# how much we multiply the size of the tile pixels
-RENDER_SCALE = 2.0
+# how much we multiply the size of the tile pixels (the window size)
+RENDER_SCALE = 2
 
 class Editor:
-    def __init__(self) -> None:   
+    # dirty_rects -> only send the parts of the screen that changed to the window
+    # most editor frames only change where the mouse is
+    # scale, window_size, scaled -> how big the window is, same as in the game (create_screen)
+    def __init__(self, dirty_rects=True, scale=RENDER_SCALE, window_size=None, scaled=False) -> None:   
         pygame.init()
 
-        SCREEN_WIDTH = 640
-        SCREEN_HEIGHT = 480
-
         pygame.display.set_caption('editor')
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.screen = create_screen((320, 240), scale=scale, window_size=window_size, scaled=scaled)
         self.display = pygame.Surface((320, 240))
+        # scales the display up onto the screen
+        self.presenter = Presenter(self.screen, dirty_rects=dirty_rects)
 
         self.clock = pygame.time.Clock()
 
@@ -40,6 +43,8 @@ class Editor:
 
         # camera
         self.scroll = [0, 0]
+        # camera offset of the last frame drawn
+        self.last_render_scroll = None
 
         # get a list of self.assets key
         self.tile_list = list(self.assets)
@@ -52,6 +57,8 @@ class Editor:
         self.right_clicking = False
         self.shift = False
         self.ongrid = True
+        # autotile the tiles around the mouse while painting
+        self.live_autotile = False
 
     def run(self):
         # game loop
@@ -66,6 +73,9 @@ class Editor:
             self.scroll[1] += (self.movement[3] - self.movement[2]) * 2
 
             render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
+            # camera moved -> the whole screen changed
+            moved = render_scroll != self.last_render_scroll
+            self.last_render_scroll = render_scroll
             self.tilemap.render(self.display, offset=render_scroll)
 
             tile_type = self.tile_list[self.tile_group]
@@ -76,9 +86,9 @@ class Editor:
 
             # gets you position of the mouse with respect to your window
             mpos = pygame.mouse.get_pos()
-            # we are scaling our images x2
+            # we are scaling our images x2 (or whatever the window is)
             # need to scale the mouse position to get accurate reading
-            mpos = (mpos[0] / RENDER_SCALE, mpos[1] / RENDER_SCALE)
+            mpos = self.presenter.to_display(self.display, mpos)
             # gives coordinates of mouse in terms of the tiles
             tile_pos = (int((mpos[0] + self.scroll[0]) // self.tilemap.tile_size),
                         int((mpos[1] + self.scroll[1]) // self.tilemap.tile_size))
@@ -96,18 +106,22 @@ class Editor:
 
             # Allows you to place tiles on the screen/ grid
             if self.clicking and self.ongrid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ';' + str(tile_pos[1])] = {'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos':tile_pos}
+                tile = self.tilemap.get_tile(tile_pos[0], tile_pos[1])
+                # with live autotile, don't paint over a tile of the same type every frame
+                # or the variant we picked undoes the autotile
+                if not (self.live_autotile and tile and tile['type'] == self.tile_list[self.tile_group]):
+                    self.tilemap.set_tile(tile_pos[0], tile_pos[1], self.tile_list[self.tile_group], self.tile_variant)
             if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ';' + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_loc]
+                self.tilemap.remove_tile(tile_pos[0], tile_pos[1])
                 
-                # bad code, remove tiles from offgrid
-                for tile in self.tilemap.offgrid_tiles.copy():
-                    tile_img = self.assets[tile['type']][tile['variant']]
-                    tile_r = pygame.Rect(tile['pos'][0] - self.scroll[0], tile['pos'][1] - self.scroll[1], tile_img.get_width(), tile_img.get_height())
-                    if tile_r.collidepoint(mpos):
-                        self.tilemap.offgrid_tiles.remove(tile)
+                # remove tiles from offgrid
+                # only asks the spatial hash about the tiles under the mouse
+                for tile in self.tilemap.offgrid_at((mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])):
+                    self.tilemap.remove_offgrid(tile)
+
+            if self.live_autotile:
+                # only redoes the tiles that changed this frame
+                self.tilemap.autotile(full=False)
 
             self.display.blit(curr_tile_img, (5, 5))
             for event in pygame.event.get():
@@ -120,7 +134,7 @@ class Editor:
                     if event.button == 1:
                         self.clicking = True
                         if not self.ongrid:
-                            self.tilemap.offgrid_tiles.append({'type' : self.tile_list[self.tile_group], 'variant':self.tile_variant, 'pos': (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])})
+                            self.tilemap.add_offgrid({'type' : self.tile_list[self.tile_group], 'variant':self.tile_variant, 'pos': (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])})
                     # right click
                     if event.button == 3:
                         self.right_clicking = True
@@ -169,6 +183,8 @@ class Editor:
                         self.tilemap.save('map.json')
                     if event.key == pygame.K_t:
                         self.tilemap.autotile()
+                    if event.key == pygame.K_l:
+                        self.live_autotile = not self.live_autotile
                 if event.type == pygame.KEYUP:
                     k = event.key
                     if (k == pygame.K_LEFT or k == pygame.K_a):
@@ -182,8 +198,7 @@ class Editor:
                     if event.key == pygame.K_LSHIFT:
                         self.shift = False
             
-            self.screen.blit(pygame.transform.scale(self.display, self.screen.get_size()), (0, 0))
-            pygame.display.update()
+            self.presenter.present(self.display, full=moved)
             self.clock.tick(60)
 
 Editor().run()
\ No newline at end of file
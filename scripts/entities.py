@@ -1,8 +1,8 @@
 import pygame
 import math
-import random
-from scripts.particle import Particle
-from scripts.spark import Spark
+
+from scripts.utils import flip_image
+from scripts.outline import outline_image
 
 
 class PhysicsEntity:
@@ -39,15 +39,19 @@ class PhysicsEntity:
 
     def set_action(self, action):
         if action != self.action:
+            # the old animation goes back to the pool for the next action change
+            if self.action:
+                self.game.animation_pool.give_back(self.animation)
             self.action = action
-            self.animation = self.game.assets[self.type + '/' + self.action].copy()
+            self.animation = self.game.assets[self.type + '/' + self.action].copy(self.game.animation_pool)
 
-    def update(self, tilemap, movement= (0, 0)):
-        # resets the collision map
-        self.collision = {'up': False, 'down': False, 'right': False, 'left': False}
+    def release(self):
+        # the entity is gone (killed, level changed), its animation can be reused
+        self.game.animation_pool.give_back(self.animation)
+        self.action = ''
 
-        # how much the entity should move in this current frame
-        frame_movement = (movement[0] + self.velocity[0],  movement[1] + self.velocity[1])
+    def update(self, tilemap, movement= (0, 0)):
+        frame_movement = self.start_update(movement)
 
         # (x, y) movement change
         # x-axis movement change
@@ -57,47 +61,42 @@ class PhysicsEntity:
         """
         need to handle one axis at a time
         can't do both x and y at the same time
+
+        tilemap.collide pushes the entity out of the tiles around it
+        -> move right and collided: right edge of the entity goes to left edge of tile
+        -> move left and collided: left edge of the entity goes to right edge of tile
+        and updates self.pos for us
         """
-        entity_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
-            if entity_rect.colliderect(rect):
-                # move right and collided with a tile
-                if frame_movement[0] > 0:
-                    # make right edge of the entity to left edge of tile
-                    # player gets pushed back during collision
-                    entity_rect.right = rect.left
-                    self.collision['right'] = True
-                # move left and collided with a tile
-                if frame_movement[0] < 0:
-                    entity_rect.left = rect.right
-                    self.collision['left'] = True
-
-                # above -> only modifying the entity_rect pos here and not player pos
-                # now -> have to go and upadate players pos
-                self.pos[0] = entity_rect.x
+        hit = tilemap.collide(self.pos, self.size, 0, frame_movement[0])
+        if hit > 0:
+            self.collision['right'] = True
+        if hit < 0:
+            self.collision['left'] = True
 
         # y-axis movement change
         self.pos[1] += frame_movement[1]
 
         # collision detection y-axis
-        entity_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
-            if entity_rect.colliderect(rect):
-                # move dowm and collided with a tile
-                if frame_movement[1] > 0:
-                    # make right edge of the entity to left edge of tile
-                    # player gets pushed back during collision
-                    entity_rect.bottom = rect.top
-                    self.collision['down'] = True
-                # move up and collided with a tile
-                if frame_movement[1] < 0:
-                    entity_rect.top = rect.bottom
-                    self.collision['up'] = True
-
-                # above -> only modifying the entity_rect pos here and not player pos
-                # now -> have to go and upadate players pos
-                self.pos[1] = entity_rect.y
-        
+        # move down and collided -> bottom of entity to top of tile
+        # move up and collided -> top of entity to bottom of tile
+        hit = tilemap.collide(self.pos, self.size, 1, frame_movement[1])
+        if hit > 0:
+            self.collision['down'] = True
+        if hit < 0:
+            self.collision['up'] = True
+
+        self.finish_update(movement)
+
+    # update() is split in 3 parts so update_all() can do the collisions of many entities at once
+    # start_update() -> collisions (tilemap.collide) -> finish_update()
+    def start_update(self, movement):
+        # resets the collision map
+        self.collision = {'up': False, 'down': False, 'right': False, 'left': False}
+
+        # how much the entity should move in this current frame
+        return (movement[0] + self.velocity[0],  movement[1] + self.velocity[1])
+
+    def finish_update(self, movement):
         # if you are moving right, player is facing right
         if movement[0] > 0:
             self.flip = False
@@ -123,16 +122,49 @@ class PhysicsEntity:
         # update the animation image
         self.animation.update()
 
-    def render(self, surf, offset= (0, 0)):
+    @staticmethod
+    def update_all(entities, tilemap, movements):
+        """
+        same as PhysicsEntity.update(tilemap, movement) for every entity
+        (the physics part only, even for entities that have their own update())
+        but the collisions of all of them go through tilemap.collide_batch in one call
+        """
+        frame_movements = [entity.start_update(movement) for entity, movement in zip(entities, movements)]
+        xs = [entity.pos[0] for entity in entities]
+        ys = [entity.pos[1] for entity in entities]
+        hits_x = [0] * len(entities)
+        hits_y = [0] * len(entities)
+        tilemap.collide_batch(xs, ys, [entity.size for entity in entities], frame_movements, hits_x, hits_y)
+
+        for i, entity in enumerate(entities):
+            entity.pos[0] = xs[i]
+            entity.pos[1] = ys[i]
+            if hits_x[i] > 0:
+                entity.collision['right'] = True
+            if hits_x[i] < 0:
+                entity.collision['left'] = True
+            if hits_y[i] > 0:
+                entity.collision['down'] = True
+            if hits_y[i] < 0:
+                entity.collision['up'] = True
+            entity.finish_update(movements[i])
+
+    # outline -> surface the dark outline goes on, None for no outline
+    def render(self, surf, offset= (0, 0), outline=None):
         """
         get current frame of the animation
         self.flip   is the x-axis flip
-        False       is the y-axis flip
+            -> the mirrored frames are made once when the images are loaded
             -> don't want to flip the player upside down
         """
-        surf.blit(pygame.transform.flip(self.animation.img(), self.flip, False), 
-                  (self.pos[0] - offset[0] + self.anim_offset[0],  # x- axis
-                  self.pos[1] - offset[1] + self.anim_offset[1]))  # y- axis
+        img = self.animation.img(self.flip)
+        pos = (self.pos[0] - offset[0] + self.anim_offset[0],  # x- axis
+               self.pos[1] - offset[1] + self.anim_offset[1])  # y- axis
+        surf.blit(img, pos)
+        if outline:
+            # the outline is 1 pixel bigger on each side
+            # blit cuts the position down to ints, the outline goes 1 pixel up and left of that
+            outline.blit(outline_image(img), (int(pos[0]) - 1, int(pos[1]) - 1))
         #surf.blit(self.game.assets['player'], (self.pos[0] - offset[0], self.pos[1] - offset[1]))
     
 class Player(PhysicsEntity):
@@ -198,18 +230,18 @@ class Player(PhysicsEntity):
         """ create a brust of particle while the player is dashing """
         # if we are at the start or end of the dash
         if abs(self.dashing) in {60, 50}:
-            # create 20 particles for the brust
-            for i in range(20):
+            # create 20 particles for the brust (fewer when the governor says the game is slow)
+            for i in range(self.game.governor.burst(20, 'particles', len(self.game.particles))):
                 # gives you a random angle from a full circle (math.pi * 2) in radians 
-                angle = random.random() * math.pi * 2
+                angle = self.game.rng.effects.random() * math.pi * 2
                 # gives you a random speed from 0 to 1
-                speed = random.random() * 0.5 + 0.5
+                speed = self.game.rng.effects.random() * 0.5 + 0.5
                 # cos is for x-axis
                 # sin is for y-axis
                 # generating a velocity based on the angle
                 # Reason: Allows you to spread the particles in a circle instead of a square
                 pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed]
-                self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
+                self.game.particles.add('particle', self.rect().center, velocity=pvelocity, frame=self.game.rng.effects.randint(0, 7))
                 
         # normalizing dashing
         if self.dashing > 0:
@@ -231,14 +263,15 @@ class Player(PhysicsEntity):
             # have to wait some time between the dashes
             # 50 frame is for cooling down
             """ create a stream of particle while the player is dashing """
-            angle = random.random() * math.pi * 2
+            angle = self.game.rng.effects.random() * math.pi * 2
             # gives you a random speed from 0 to 1
-            speed = random.random() * 0.5 + 0.5
+            speed = self.game.rng.effects.random() * 0.5 + 0.5
             # x-axis (1 or -1) * random * 3
             # particles moving with the movement of the player
             # movment of the y-axis
-            pvelocity = [abs(self.dashing) / self.dashing * random.random() * 3, 0]
-            self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
+            pvelocity = [abs(self.dashing) / self.dashing * self.game.rng.effects.random() * 3, 0]
+            if self.game.governor.burst(1, 'particles', len(self.game.particles)):
+                self.game.particles.add('particle', self.rect().center, velocity=pvelocity, frame=self.game.rng.effects.randint(0, 7))
 
         # normalizaiton on the horizontal velocity
         # bring the velocity toward 0
@@ -247,11 +280,11 @@ class Player(PhysicsEntity):
         else:
             self.velocity[0] = min(self.velocity[0] + 0.1, 0)
     
-    def render(self, surf, offset=(0, 0)):
+    def render(self, surf, offset=(0, 0), outline=None):
         # when dashing, makes player invisible
         if abs(self.dashing) <= 50:
             # calls the Physics entity function
-            super().render(surf, offset = offset)
+            super().render(surf, offset = offset, outline=outline)
 
     def jump(self):
         # for wall slide
@@ -312,6 +345,16 @@ class Enemy(PhysicsEntity):
         self.walking = 0
 
     def update(self, tilemap, movement=(0, 0)):
+        movement = self.walk(tilemap, movement)
+
+        # with new parameters, we update the enemy movement
+        super().update(tilemap, movement=movement)
+
+        return self.after_move(movement)
+
+    # split out of update() so game.py can move all the enemies with PhysicsEntity.update_all
+    # walk() -> PhysicsEntity.update -> after_move()
+    def walk(self, tilemap, movement=(0, 0)):
         # if walking
         if self.walking:
 
@@ -349,43 +392,44 @@ class Enemy(PhysicsEntity):
                         self.game.sfx['shoot'].play()
 
                         # spawn projectile to the left
-                         # [(x, y), direction, timer]
-                        self.game.projectiles.append([[self.rect().centerx - 7, self.rect().centery], -1.5, 0])
+                        # pos, direction (pixels a frame)
+                        pos = [self.rect().centerx - 7, self.rect().centery]
+                        self.game.projectiles.add(pos, -1.5)
 
                         # spawn the spark for the projectile
                         # spawns 4 sparks
-                        for i in range(4):
+                        for i in range(self.game.governor.burst(4, 'sparks', len(self.game.sparks))):
                             # give Sparks 
                             # pos, angle = rand number btw (0, 0.5) because it is shooting left + math.pi
                             # speed between 0, 2
-                            self.game.sparks.append(Spark(self.game.projectiles[-1][0], random.random() - 0.5 + math.pi, 2 + random.random()))
+                            self.game.sparks.add(pos, self.game.rng.effects.random() - 0.5 + math.pi, 2 + self.game.rng.effects.random())
                     # if player is to the right of enemy and enemy is facing right
                     if (not self.flip and dis[0] > 0):
                         # plays the shooting sound
                         self.game.sfx['shoot'].play()
 
                         # spawn projectile to the right
-                         # [(x, y), direction, timer]
-                        self.game.projectiles.append([[self.rect().centerx + 7, self.rect().centery], 1.5, 0])
+                        # pos, direction (pixels a frame)
+                        pos = [self.rect().centerx + 7, self.rect().centery]
+                        self.game.projectiles.add(pos, 1.5)
                         # spawn the spark for the projectile
-                        for i in range(4):
+                        for i in range(self.game.governor.burst(4, 'sparks', len(self.game.sparks))):
                             # give Sparks 
                             # pos, angle = rand number btw (0, 0.5) because it is shooting right no math.pi
                             # speed between 0, 2
-                            self.game.sparks.append(Spark(self.game.projectiles[-1][0], random.random() - 0.5, 2 + random.random()))
+                            self.game.sparks.add(pos, self.game.rng.effects.random() - 0.5, 2 + self.game.rng.effects.random())
                     
 
         # has 1 in 100 chance of occuring, 60fps -> 1 in 1.67 secs
         # if not walking
-        elif random.random() < 0.01:
+        elif self.game.rng.enemies.random() < 0.01:
             #  walking set to random number between 30 and 120 -> 0.5 to 2 secs
             #  number of frames the the enemy will continue to walk for
-            self.walking = random.randint(30, 120)
-        
-        # with new parameters, we update the enemy movement
-        super().update(tilemap, movement=movement)
+            self.walking = self.game.rng.enemies.randint(30, 120)
 
+        return movement
 
+    def after_move(self, movement):
         # Animation for enemy
         if movement[0] != 0:
             self.set_action('run')
@@ -404,34 +448,43 @@ class Enemy(PhysicsEntity):
                 self.game.sfx['hit'].play()
                 
                 # spark go off when projectile hits a player
-                # # spawns 30 sparks
-                for i in range(30):
+                # # spawns 30 sparks (fewer when the governor says the game is slow)
+                spark_count = self.game.governor.burst(30, 'sparks', len(self.game.sparks))
+                particle_count = self.game.governor.burst(30, 'particles', len(self.game.particles))
+                for i in range(max(spark_count, particle_count)):
                     # gives random angle in a circle in radians
-                    angle = random.random() * math.pi * 2
-                    speed = random.random() * 5
-                    self.game.sparks.append(Spark(self.rect().center, angle, 2 + random.random()))
+                    angle = self.game.rng.effects.random() * math.pi * 2
+                    speed = self.game.rng.effects.random() * 5
+                    if i < spark_count:
+                        self.game.sparks.add(self.rect().center, angle, 2 + self.game.rng.effects.random())
 
                     # add particles -> 30 particles as well
-                    self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=random.randint(0, 7)))
+                    if i < particle_count:
+                        self.game.particles.add('particle', self.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=self.game.rng.effects.randint(0, 7))
 
                 # add big spark when the enemy dies
-                self.game.sparks.append(Spark(self.rect().center, 0, 5 + random.random()))
-                self.game.sparks.append(Spark(self.rect().center, math.pi, 5 + random.random()))
+                self.game.sparks.add(self.rect().center, 0, 5 + self.game.rng.effects.random())
+                self.game.sparks.add(self.rect().center, math.pi, 5 + self.game.rng.effects.random())
                 
                 # removes the enemy on the game.py side
                 return True
     
-    def render(self, surf, offset=(0, 0)):
-        super().render(surf, offset=offset)
+    def render(self, surf, offset=(0, 0), outline=None):
+        super().render(surf, offset=offset, outline=outline)
 
         # show enemy gun
         # gun needs to flip based on the direction the player is facing
         # if player is facing left
-        # pygame.transorm.flip, True, False -> flips the gun image only on x-axis, and not y-axis
+        # flip_image -> the gun image flipped only on x-axis, and not y-axis (made once)
         # rest is  where we are going to put the gun
         if self.flip:
-            surf.blit(pygame.transform.flip(self.game.assets['gun'], True, False), (self.rect().centerx - 4 - self.game.assets['gun'].get_width() - offset[0], self.rect().centery - offset[1]))
+            img = flip_image(self.game.assets['gun'])
+            pos = (self.rect().centerx - 4 - self.game.assets['gun'].get_width() - offset[0], self.rect().centery - offset[1])
         
         # don't need to flip in this case
         else:
-            surf.blit(self.game.assets['gun'], (self.rect().centerx + 4 - offset[0], self.rect().centery - offset[1]))
+            img = self.game.assets['gun']
+            pos = (self.rect().centerx + 4 - offset[0], self.rect().centery - offset[1])
+        surf.blit(img, pos)
+        if outline:
+            outline.blit(outline_image(img), (int(pos[0]) - 1, int(pos[1]) - 1))
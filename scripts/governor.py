@@ -0,0 +1,94 @@
+from collections import deque
+
+class EffectsGovernor:
+    """
+    keeps the frame time under target_ms by spawning fewer effects when the game runs slow
+
+    record() gets how long each frame took (the work, not the 60 fps wait)
+    every window frames the average is checked
+    -> too slow   -> quality goes down a step
+    -> fast again -> quality goes back up (half a step, so it doesn't flip back and forth)
+
+    quality 1 -> everything is spawned like normal
+    as quality drops the leaves go first (none at all at 0.5)
+    below 0.5 the bursts (hit sparks, dash particles, ...) get smaller too
+
+    budgets -> most live effects of each kind, on top of the quality
+               'leaves' is how many live particles there can be before leaves stop
+               so leaves are cut before the particles from hits and dashes
+    """
+    def __init__(self, target_ms=1000 / 60, budgets=None, min_quality=0.25, step=0.1, window=30):
+        self.target_ms = target_ms
+        self.budgets = {'particles': 3000, 'sparks': 1000, 'leaves': 1500}
+        if budgets:
+            self.budgets.update(budgets)
+        self.min_quality = min_quality
+        self.step = step
+        self.window = window
+
+        self.quality = 1.0
+        self.frame_times = deque(maxlen=window)
+        self.frames = 0
+
+        # counters for logging, per kind
+        self.spawned = {kind: 0 for kind in self.budgets}
+        self.dropped = {kind: 0 for kind in self.budgets}
+
+    def record(self, frame_ms):
+        self.frame_times.append(frame_ms)
+        self.frames += 1
+        if self.frames % self.window == 0:
+            self.adjust()
+
+    def frame_ms(self):
+        # average of the last window frames
+        if not self.frame_times:
+            return 0
+        return sum(self.frame_times) / len(self.frame_times)
+
+    def adjust(self):
+        frame_ms = self.frame_ms()
+        if frame_ms > self.target_ms:
+            self.quality = max(self.min_quality, self.quality - self.step)
+        elif frame_ms < self.target_ms * 0.8:
+            self.quality = min(1.0, self.quality + self.step / 2)
+
+    def leaf_scale(self):
+        # 1 -> every leaf, 0 -> no leaves
+        return max(0.0, min(1.0, (self.quality - 0.5) * 2))
+
+    def burst_scale(self):
+        return min(1.0, self.quality * 2)
+
+    def burst(self, count, kind, live):
+        """
+        how many of a burst of count effects to spawn
+        kind -> 'particles' or 'sparks', live -> how many of them are alive now
+        """
+        allowed = count
+        if self.quality < 0.5:
+            allowed = int(count * self.burst_scale() + 0.5)
+        allowed = max(0, min(allowed, self.budgets[kind] - live))
+        self.spawned[kind] += allowed
+        self.dropped[kind] += count - allowed
+        return allowed
+
+    def leaf(self, live_particles, roll):
+        """
+        True if a leaf can be spawned
+        roll -> random number [0, 1), only used when some of the leaves are being dropped
+        """
+        scale = self.leaf_scale()
+        if live_particles >= self.budgets['leaves'] or (scale < 1 and roll() >= scale):
+            self.dropped['leaves'] += 1
+            return False
+        self.spawned['leaves'] += 1
+        return True
+
+    def stats(self):
+        return {
+            'quality': self.quality,
+            'frame_ms': self.frame_ms(),
+            'spawned': dict(self.spawned),
+            'dropped': dict(self.dropped),
+        }
@@ -0,0 +1,41 @@
+from collections import OrderedDict
+
+class LevelCache:
+    """
+    keeps levels the way they are right after load_level() finished setting them up
+    (tiles with the spawners taken out, leaf spawner rects, spawn points)
+    so dying and restarting a level doesn't read and parse the map again
+
+    only the last max_levels levels are kept
+    when it is full the one used longest ago is thrown away (least recently used)
+    """
+    def __init__(self, max_levels=3):
+        self.max_levels = max_levels
+        # map id -> level, oldest first
+        self.levels = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __contains__(self, map_id):
+        return map_id in self.levels
+
+    def get(self, map_id):
+        if map_id not in self.levels:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # just used -> newest
+        self.levels.move_to_end(map_id)
+        return self.levels[map_id]
+
+    def put(self, map_id, level):
+        self.levels[map_id] = level
+        self.levels.move_to_end(map_id)
+        while len(self.levels) > self.max_levels:
+            self.levels.popitem(last=False)
+
+    def clear(self):
+        self.levels = OrderedDict()
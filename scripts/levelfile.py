@@ -0,0 +1,178 @@
+"""
+compact binary level format (.lvl)
+
+the json maps store every tile as {'type': 'grass', 'variant': 1, 'pos': [3, 5]}
+with a '3;5' key on top of that
+this stores the tile types once and every grid tile as one 16 bit number
+
+everything is little endian
+header      -> magic, version, tile size, chunk shift, palette size, chunk count, off grid count
+palette     -> tile type names, each one is a length byte + utf-8 bytes
+(padding to 4 bytes)
+chunk table -> (chunk x, chunk y) int32 pairs
+chunk cells -> CHUNK_CELLS uint16 packed tiles per chunk, same packing as ChunkGrid
+off grid    -> (type index uint16, variant uint8, pad, x float32, y float32) per tile
+
+off grid positions are float32, the editor only places them on half pixels so nothing is lost
+"""
+
+import os
+import sys
+import mmap
+import json
+import struct
+from array import array
+
+try:
+    from scripts.chunkgrid import ChunkGrid, CHUNK_SHIFT, CHUNK_CELLS
+except ModuleNotFoundError:
+    from chunkgrid import ChunkGrid, CHUNK_SHIFT, CHUNK_CELLS
+
+MAGIC = b'PLVL'
+VERSION = 1
+HEADER = struct.Struct('<4sHHBxHII')
+CHUNK_KEY = struct.Struct('<ii')
+OFFGRID = struct.Struct('<HBxff')
+
+def is_level_file(path):
+    return path.endswith('.lvl')
+
+def save_level(path, tile_size, grid, offgrid_tiles):
+    # grid tiles keep the palette index they already have in the ChunkGrid
+    # off grid only types go on the end of the palette
+    types = list(grid.types)
+    for tile in offgrid_tiles:
+        if tile['type'] not in types:
+            types.append(tile['type'])
+    type_ids = {tile_type: i for i, tile_type in enumerate(types)}
+
+    keys = list(grid.chunks)
+    data = bytearray(HEADER.pack(MAGIC, VERSION, tile_size, CHUNK_SHIFT, len(types), len(keys), len(offgrid_tiles)))
+    for tile_type in types:
+        name = tile_type.encode('utf-8')
+        data.append(len(name))
+        data += name
+    data += bytes(-len(data) % 4)
+
+    for key in keys:
+        data += CHUNK_KEY.pack(key[0], key[1])
+    for key in keys:
+        cells = array('H', grid.chunks[key])
+        if sys.byteorder != 'little':
+            cells.byteswap()
+        data += cells.tobytes()
+
+    for tile in offgrid_tiles:
+        data += OFFGRID.pack(type_ids[tile['type']], tile['variant'], tile['pos'][0], tile['pos'][1])
+
+    # a loaded level's chunks are views into the mapped file (load_level)
+    # writing over that file would change the level in memory under us
+    # -> write a new file and swap it in, the old mapping keeps the old file
+    tmp_path = path + '.tmp'
+    f = open(tmp_path, 'wb')
+    f.write(data)
+    f.close()
+    os.replace(tmp_path, path)
+
+def parse(buf, path=''):
+    """
+    reads everything but the chunk cells
+    returns (tile_size, types, chunk offsets {key: where its cells start}, off grid tiles)
+    """
+    magic, version, tile_size, chunk_shift, type_count, chunk_count, offgrid_count = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(path + ' is not a level file this game can read')
+    if chunk_shift != CHUNK_SHIFT:
+        raise ValueError(path + ' was saved with a different chunk size')
+
+    offset = HEADER.size
+    types = []
+    for i in range(type_count):
+        length = buf[offset]
+        types.append(bytes(buf[offset + 1:offset + 1 + length]).decode('utf-8'))
+        offset += 1 + length
+    offset += -offset % 4
+
+    keys = []
+    for i in range(chunk_count):
+        keys.append(CHUNK_KEY.unpack_from(buf, offset))
+        offset += CHUNK_KEY.size
+
+    offsets = {}
+    for key in keys:
+        offsets[key] = offset
+        offset += CHUNK_CELLS * 2
+
+    offgrid = []
+    for i in range(offgrid_count):
+        type_id, variant, x, y = OFFGRID.unpack_from(buf, offset)
+        offgrid.append({'type': types[type_id], 'variant': variant, 'pos': [x, y]})
+        offset += OFFGRID.size
+
+    return tile_size, types, offsets, offgrid
+
+def load_level(path):
+    """
+    memory maps the file instead of reading it
+    the chunk cells are views straight into the mapped file (copy on write)
+    so only the parts of the level we touch are actually read from disk
+
+    returns {'tile_size', 'types', 'chunks', 'offgrid', 'mmap'}
+    keep 'mmap' alive for as long as the chunks are used
+    (save_level swaps in a new file instead of writing into this one, so saving over it is fine)
+    """
+    f = open(path, 'rb')
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    f.close()
+
+    tile_size, types, offsets, offgrid = parse(mm, path)
+
+    view = memoryview(mm)
+    chunks = {}
+    for key, offset in offsets.items():
+        cells = view[offset:offset + CHUNK_CELLS * 2]
+        if sys.byteorder == 'little':
+            chunks[key] = cells.cast('H')
+        else:
+            chunks[key] = array('H', cells)
+            chunks[key].byteswap()
+
+    return {'tile_size': tile_size, 'types': types, 'chunks': chunks, 'offgrid': offgrid, 'mmap': mm}
+
+def read_index(path):
+    # like load_level but without the chunks, for streaming them in one at a time (read_chunk)
+    f = open(path, 'rb')
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    f.close()
+    tile_size, types, offsets, offgrid = parse(mm, path)
+    mm.close()
+    return {'tile_size': tile_size, 'types': types, 'offsets': offsets, 'offgrid': offgrid}
+
+def read_chunk(f, offset):
+    # f is a level file opened with 'rb', offset comes from read_index
+    # a plain read lets other threads run while we wait on the disk
+    f.seek(offset)
+    cells = array('H')
+    cells.frombytes(f.read(CHUNK_CELLS * 2))
+    if sys.byteorder != 'little':
+        cells.byteswap()
+    return cells
+
+def convert(json_path, lvl_path=None):
+    # json map -> .lvl next to it (or at lvl_path)
+    if lvl_path is None:
+        lvl_path = os.path.splitext(json_path)[0] + '.lvl'
+    f = open(json_path, 'r')
+    map_data = json.load(f)
+    f.close()
+
+    grid = ChunkGrid()
+    grid.load_dict(map_data['tilemap'])
+    save_level(lvl_path, map_data['tile_size'], grid, map_data['offgrid'])
+    return lvl_path
+
+# python scripts/levelfile.py data/maps/0.json data/maps/1.json map.json
+if __name__ == '__main__':
+    for json_path in sys.argv[1:]:
+        lvl_path = convert(json_path)
+        print(json_path, os.path.getsize(json_path), 'bytes ->', lvl_path, os.path.getsize(lvl_path), 'bytes')
@@ -0,0 +1,36 @@
+import pygame
+
+# (r, g, b, alpha) alpha = transperency, 0 is fully transparent
+OUTLINE_COLOR = (0, 0, 0, 180)
+# the silhouette is put 1 pixel left, right, up and down of the sprite
+OUTLINE_OFFSETS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+# image -> its outline, made once
+OUTLINES = {}
+
+def make_outline(img):
+    """
+    the dark outline around a sprite, as a surface 1 pixel bigger on every side
+    draw it at (x - 1, y - 1) under the sprite at (x, y)
+
+    mask is image with two color (black and white)
+    we use it convert something that has multiple colors to only two colors
+    the 4 silhouettes are blitted on top of each other here once
+    where they overlap it gets darker, same as blitting them one by one on the screen
+    """
+    mask = pygame.mask.from_surface(img)
+    silhouette = mask.to_surface(setcolor=OUTLINE_COLOR, unsetcolor=(0, 0, 0, 0))
+    outline = pygame.Surface((img.get_width() + 2, img.get_height() + 2), pygame.SRCALPHA)
+    for offset in OUTLINE_OFFSETS:
+        outline.blit(silhouette, (1 + offset[0], 1 + offset[1]))
+    return outline
+
+def outline_image(img):
+    if img not in OUTLINES:
+        OUTLINES[img] = make_outline(img)
+    return OUTLINES[img]
+
+def outline_images(images):
+    # make the outlines of a list of images now (at load time) instead of on the first draw
+    for img in images:
+        outline_image(img)
@@ -1,25 +1,166 @@
-class Particle:
-    def __init__(self, game, p_type, pos, velocity=[0, 0], frame= 0):
+import math
+
+class ParticleSystem:
+    """
+    every particle in the game, kept as columns instead of one object per particle
+    particle i is xs[i], ys[i], vxs[i], vys[i], frames[i], kinds[i]
+
+    -> no Particle object and no Animation copy for each particle
+    -> update() is one loop over plain lists
+    -> dead particles are packed out in the same loop (compaction) instead of list.remove() one by one
+    -> render() draws everything with one Surface.blits() call
+
+    the particle types use the 'particle/<type>' animations in game.assets
+    they are not looping animations, a particle dies one update after its animation is done
+    """
+    def __init__(self, game):
         self.game = game
-        self.type = p_type
-        self.pos = list(pos)
-        self.velocity = list(velocity)
-        self.animation = self.game.assets['particle/' + p_type].copy()
-        self.animation.frame = frame
 
-    
+        # particle type -> kind number
+        self.kind_ids = {}
+        # kind number -> particle type
+        self.kinds_types = []
+        # kind number -> [(img, half width, half height, atlas area)] for every animation frame
+        # img is the atlas page when the game has an atlas (atlas.py), area is None when it doesn't
+        self.kind_frames = []
+        # kind number -> last animation frame
+        self.kind_last = []
+        # kind number -> 1 if the particle sways (leaves)
+        self.kind_sway = []
+
+        self.clear()
+
+    def clear(self):
+        self.xs = []
+        self.ys = []
+        self.vxs = []
+        self.vys = []
+        self.frames = []
+        self.kinds = []
+        # 1 once the animation got to the last frame (Animation.done)
+        self.done = bytearray()
+
+    def __len__(self):
+        return len(self.xs)
+
+    def kind(self, p_type):
+        # first particle of a type -> look its animation up
+        if p_type not in self.kind_ids:
+            animation = self.game.assets['particle/' + p_type]
+            atlas = getattr(self.game, 'atlas', None)
+            frames = []
+            for i in range(animation.img_duration * len(animation.images)):
+                img = animation.images[int(i / animation.img_duration)]
+                if atlas and img in atlas:
+                    page, area = atlas.regions[img]
+                    frames.append((page, img.get_width() // 2, img.get_height() // 2, area))
+                else:
+                    frames.append((img, img.get_width() // 2, img.get_height() // 2, None))
+            self.kind_ids[p_type] = len(self.kinds_types)
+            self.kinds_types.append(p_type)
+            self.kind_frames.append(frames)
+            self.kind_last.append(len(frames) - 1)
+            self.kind_sway.append(1 if p_type == 'leaf' else 0)
+        return self.kind_ids[p_type]
+
+    # age -> updates the particle has already had (spawned earlier, off screen)
+    # returns False if it would already be dead
+    def add(self, p_type, pos, velocity=(0, 0), frame=0, age=0):
+        kind = self.kind(p_type)
+        x = pos[0]
+        y = pos[1]
+        done = 0
+        if age:
+            last = self.kind_last[kind]
+            for i in range(age):
+                # same steps as update()
+                if done:
+                    return False
+                x += velocity[0]
+                y += velocity[1]
+                frame += 1
+                if frame >= last:
+                    frame = last
+                    done = 1
+                if self.kind_sway[kind]:
+                    x += math.sin(frame * 0.035) * 0.3
+
+        self.xs.append(x)
+        self.ys.append(y)
+        self.vxs.append(velocity[0])
+        self.vys.append(velocity[1])
+        self.frames.append(frame)
+        self.kinds.append(kind)
+        self.done.append(done)
+        return True
+
+    def types(self):
+        # type of every particle, in order
+        return [self.kinds_types[kind] for kind in self.kinds]
+
     def update(self):
-        kill = False
-        if self.animation.done:
-            kill = True
-
-        self.pos[0] += self.velocity[0]
-        self.pos[1] += self.velocity[1]
-
-        self.animation.update()
-        return kill
-    
-    def render(self, surf, offset= (0, 0)):
-        img = self.animation.img()
-        surf.blit(img, (self.pos[0] - offset[0] - img.get_width() // 2,
-                        self.pos[1] - offset[1] - img.get_height() // 2))
\ No newline at end of file
+        xs = self.xs
+        ys = self.ys
+        vxs = self.vxs
+        vys = self.vys
+        frames = self.frames
+        kinds = self.kinds
+        done = self.done
+        kind_last = self.kind_last
+        kind_sway = self.kind_sway
+        sin = math.sin
+
+        # slot the next particle that stays alive goes into
+        # the lists are packed in place so they keep their memory from frame to frame
+        kept = 0
+        for i in range(len(xs)):
+            # the animation finished last update -> taken out
+            if done[i]:
+                continue
+
+            kind = kinds[i]
+            x = xs[i] + vxs[i]
+            y = ys[i] + vys[i]
+
+            # same as Animation.update() when loop=False
+            frame = frames[i] + 1
+            last = kind_last[kind]
+            if frame >= last:
+                frame = last
+                done[i] = 1
+
+            if kind_sway[kind]:
+                # passing in animation frame to sin function
+                # sin() gives a num between [-1, 1]
+                # makes the particle move back and forth over time in smooth pattern
+                # 0.035 is to slow down the sin function so you don't loop fast
+                x += sin(frame * 0.035) * 0.3
+
+            xs[kept] = x
+            ys[kept] = y
+            frames[kept] = frame
+            if kept != i:
+                vxs[kept] = vxs[i]
+                vys[kept] = vys[i]
+                kinds[kept] = kind
+                done[kept] = done[i]
+            kept += 1
+
+        if kept < len(xs):
+            del xs[kept:]
+            del ys[kept:]
+            del vxs[kept:]
+            del vys[kept:]
+            del frames[kept:]
+            del kinds[kept:]
+            del done[kept:]
+
+    def render(self, surf, offset=(0, 0)):
+        kind_frames = self.kind_frames
+        ox = offset[0]
+        oy = offset[1]
+        blits = []
+        for x, y, frame, kind in zip(self.xs, self.ys, self.frames, self.kinds):
+            img, half_w, half_h, area = kind_frames[kind][frame]
+            blits.append((img, (x - ox - half_w, y - oy - half_h), area))
+        surf.blits(blits, doreturn=False)
@@ -0,0 +1,39 @@
+class Pool:
+    """
+    a free list of objects that aren't used anymore
+    take() hands one of them back out instead of making a new object
+    so bursts (hits, dashes, action changes) don't make a pile of garbage for the gc
+
+    make     -> function that makes a new object when the free list is empty
+    max_free -> how many unused objects to hold on to at most
+    """
+    def __init__(self, make, max_free=256):
+        self.make = make
+        self.max_free = max_free
+        self.free = []
+
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+
+    def take(self):
+        if self.free:
+            self.reused += 1
+            return self.free.pop()
+        self.created += 1
+        return self.make()
+
+    def give_back(self, obj):
+        # obj must not be used by anything after this
+        self.released += 1
+        if len(self.free) < self.max_free:
+            self.free.append(obj)
+
+    def stats(self):
+        return {
+            'created': self.created,
+            'reused': self.reused,
+            'released': self.released,
+            'free': len(self.free),
+            'in_use': self.created + self.reused - self.released,
+        }
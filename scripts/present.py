@@ -0,0 +1,169 @@
+import pygame
+
+def create_screen(display_size, scale=2, window_size=None, scaled=False):
+    """
+    opens the window for a display of display_size
+    scale       -> whole number the display is multiplied by (2 -> 320x240 becomes 640x480)
+    window_size -> any (w, h) instead, the display is stretched to fit it
+    scaled      -> pygame.SCALED, the window surface is the size of the display and SDL scales it up
+                   (on the graphics card when it can), nothing is scaled by us
+    """
+    if scaled:
+        return pygame.display.set_mode(display_size, pygame.SCALED)
+    if window_size:
+        return pygame.display.set_mode(window_size)
+    return pygame.display.set_mode((display_size[0] * scale, display_size[1] * scale))
+
+class Presenter:
+    """
+    puts the small display on the screen (scaled up) and tells the window what changed
+
+    scaling is done straight into the screen (pygame.transform.scale with a destination)
+    so no new 640x480 (or bigger) surface is made every frame
+    only when the display and the screen have different pixel formats it goes through
+    one surface made once (self.scaled)
+    screenshake moves the screen pixels in place with screen.scroll(), no copy of the frame
+
+    pygame.display.update() with nothing -> the whole window is sent every frame
+    with dirty_rects=True only the parts that changed since the last frame are sent
+    (the part that costs the most with software rendering), nothing at all if the frame is the same
+
+    finding what changed:
+    the frame is compared to a copy of the last one with 3 blits and a mask (all done by pygame in C)
+    -> |new - old| is black where nothing changed, the mask is every pixel that isn't black
+    -> get_bounding_rects() gives the boxes around the changed pixels
+
+    full updates (no compare) when:
+    -> present(full=True), the game does that when the camera moves (everything moves anyway)
+    -> the frame is shaken (offset) or the last one was
+    -> too many boxes or too much of the screen changed, one update is cheaper then
+    """
+    def __init__(self, screen, dirty_rects=False, max_rects=16, max_area=0.5):
+        self.screen = screen
+        # screen size surface for scaling when the formats don't match, made the first time it's needed
+        self.scaled = None
+        self.dirty_rects = dirty_rects
+        self.max_rects = max_rects
+        self.max_area = max_area
+
+        # last frame presented, and 2 surfaces to work out the difference in
+        # (made on the first present, when we know the size of the display)
+        self.last = None
+        self.diff = None
+        self.diff_2 = None
+        self.last_offset = (0, 0)
+
+        # counters for profiling
+        self.frames = 0
+        self.full_frames = 0
+        self.dirty_frames = 0
+        # frames where nothing changed, nothing sent
+        self.skipped_frames = 0
+        # how many screen pixels were sent
+        self.pixels = 0
+
+    def scale_factor(self, surf):
+        # dirty rects only work when the screen is a whole number times the display
+        sw, sh = self.screen.get_size()
+        w, h = surf.get_size()
+        if sw % w or sh % h or sw // w != sh // h:
+            return 0
+        return sw // w
+
+    def to_display(self, surf, pos):
+        # position on the window (mouse) -> position on the display
+        # (with pygame.SCALED the mouse already comes in display pixels and this does nothing)
+        return (pos[0] * surf.get_width() / self.screen.get_width(), pos[1] * surf.get_height() / self.screen.get_height())
+
+    def scale_into(self, surf, dest):
+        # scale surf to the size of dest, into dest
+        if surf.get_size() == dest.get_size():
+            dest.blit(surf, (0, 0))
+        elif surf.get_bytesize() == dest.get_bytesize() and surf.get_masks() == dest.get_masks():
+            pygame.transform.scale(surf, dest.get_size(), dest)
+        else:
+            # transform.scale can only write into a surface with the same format
+            if self.scaled is None or self.scaled.get_size() != self.screen.get_size() or self.scaled.get_masks() != surf.get_masks():
+                self.scaled = pygame.Surface(self.screen.get_size(), 0, surf)
+            target = self.scaled.subsurface((0, 0) + dest.get_size())
+            pygame.transform.scale(surf, dest.get_size(), target)
+            dest.blit(target, (0, 0))
+
+    def changed(self, surf):
+        # boxes (in display pixels) around everything that changed since the last frame
+        if self.last is None or self.last.get_size() != surf.get_size():
+            size = surf.get_size()
+            self.last = pygame.Surface(size).convert()
+            self.diff = pygame.Surface(size).convert()
+            self.diff_2 = pygame.Surface(size).convert()
+            # everything that isn't black goes in the mask
+            self.diff.set_colorkey((0, 0, 0))
+            self.last.blit(surf, (0, 0))
+            return [surf.get_rect()]
+
+        # diff = new - old, diff_2 = old - new (below 0 -> 0), diff + diff_2 -> |new - old|
+        self.diff.blit(surf, (0, 0))
+        self.diff.blit(self.last, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+        self.diff_2.blit(self.last, (0, 0))
+        self.diff_2.blit(surf, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+        self.diff.blit(self.diff_2, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+
+        self.last.blit(surf, (0, 0))
+        return pygame.mask.from_surface(self.diff).get_bounding_rects()
+
+    def present(self, surf, offset=(0, 0), full=False):
+        """
+        surf   -> the small display everything was drawn on
+        offset -> where it goes on the screen (screenshake), in screen pixels
+        full   -> skip the compare, send the whole screen
+        """
+        self.frames += 1
+        offset = (int(offset[0]), int(offset[1]))
+        shaken = offset != (0, 0) or self.last_offset != (0, 0)
+        self.last_offset = offset
+
+        factor = self.scale_factor(surf) if self.dirty_rects else 0
+        rects = None
+        if factor and not shaken and not full:
+            rects = self.changed(surf)
+            area = sum(rect.w * rect.h for rect in rects)
+            if len(rects) > self.max_rects or area > surf.get_width() * surf.get_height() * self.max_area:
+                rects = None
+        elif factor and self.last is not None:
+            # not compared, but the next frame is compared to this one
+            self.last.blit(surf, (0, 0))
+
+        if rects is None:
+            # we first scale the display to fit the screen, right onto the screen
+            self.scale_into(surf, self.screen)
+            if offset != (0, 0):
+                # then move it by the screenshake (the edge that opens up keeps the unshaken pixels)
+                self.screen.scroll(offset[0], offset[1])
+            # this updates the screen
+            pygame.display.update()
+            self.full_frames += 1
+            self.pixels += self.screen.get_width() * self.screen.get_height()
+            return
+
+        if not rects:
+            self.skipped_frames += 1
+            return
+
+        # only scale and send the boxes that changed
+        screen_rects = []
+        for rect in rects:
+            screen_rect = pygame.Rect(rect.x * factor, rect.y * factor, rect.w * factor, rect.h * factor)
+            self.scale_into(surf.subsurface(rect), self.screen.subsurface(screen_rect))
+            screen_rects.append(screen_rect)
+            self.pixels += screen_rect.w * screen_rect.h
+        pygame.display.update(screen_rects)
+        self.dirty_frames += 1
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'full': self.full_frames,
+            'dirty': self.dirty_frames,
+            'skipped': self.skipped_frames,
+            'pixels': self.pixels,
+        }
@@ -0,0 +1,138 @@
+import csv
+import json
+import time
+from collections import deque
+
+import pygame
+
+class FrameProfiler:
+    """
+    times the parts (phases) of each frame
+
+    start() at the top of the frame, mark(name) after each part -> the time since the
+    last mark goes to that name (a name marked twice in a frame adds up, like
+    'update.enemies' when the game runs 2 ticks in one frame), end() when the frame is done
+
+    count(name, value) -> numbers that aren't times (how many particles, blits, ...)
+
+    the last history frames are kept for the overlay (averages)
+    the last trace_frames frames are kept for save() -> .json or .csv file
+
+    when enabled is False every call returns straight away, so it can stay in the game loop
+    """
+    def __init__(self, enabled=False, history=60, trace_frames=3600, trace_path=None):
+        self.enabled = enabled
+        self.history = deque(maxlen=history)
+        self.trace = deque(maxlen=trace_frames)
+        self.trace_path = trace_path
+
+        self.frames = 0
+        self.phases = {}
+        self.counts = {}
+        self.frame_start = 0
+        self.last = 0
+        # last totals given to count_delta()
+        self.totals = {}
+        # names given to count() (everything else in a row is a time)
+        self.count_names = []
+
+        self.font = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        # turned on in the middle of a frame -> time from now
+        self.phases = {}
+        self.counts = {}
+        self.frame_start = self.last = time.perf_counter()
+
+    def start(self):
+        if not self.enabled:
+            return
+        self.phases = {}
+        self.counts = {}
+        self.frame_start = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0) + (now - self.last) * 1000
+        self.last = now
+
+    def count(self, name, value):
+        if self.enabled:
+            self.counts[name] = value
+            if name not in self.count_names:
+                self.count_names.append(name)
+
+    def count_delta(self, name, total):
+        # for counters that only go up (DrawQueue.blit_count) -> how much they went up this frame
+        if self.enabled:
+            self.count(name, total - self.totals.get(name, total))
+            self.totals[name] = total
+
+    def end(self):
+        if not self.enabled:
+            return
+        self.frames += 1
+        row = {'frame': self.frames, 'total': (time.perf_counter() - self.frame_start) * 1000}
+        row.update(self.phases)
+        row.update(self.counts)
+        self.history.append(row)
+        self.trace.append(row)
+
+    def averages(self):
+        # name -> average over the history frames (a phase missing from a frame counts as 0)
+        if not self.history:
+            return {}
+        names = []
+        for row in self.history:
+            for name in row:
+                if name != 'frame' and name not in names:
+                    names.append(name)
+        return {name: sum(row.get(name, 0) for row in self.history) / len(self.history) for name in names}
+
+    def save(self, path=None):
+        """
+        writes the trace (the last trace_frames frames)
+        .json -> list of {name: value}, anything else -> csv with a column per name
+        """
+        path = path or self.trace_path
+        if not path or not self.trace:
+            return None
+        rows = list(self.trace)
+        if path.endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump(rows, f)
+        else:
+            names = []
+            for row in rows:
+                for name in row:
+                    if name not in names:
+                        names.append(name)
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=names, restval=0)
+                writer.writeheader()
+                writer.writerows(rows)
+        return path
+
+    def render(self, surf, pos=(2, 2), lines=12):
+        # the overlay: total frame time, the slowest phases and the counts, averaged
+        if not self.enabled:
+            return
+        if not self.font:
+            self.font = pygame.font.Font(None, 12)
+        averages = self.averages()
+        if not averages:
+            return
+        texts = ['frame %.2f ms (%d fps)' % (averages['total'], 1000 / max(averages['total'], 0.001))]
+        phases = sorted((name for name in averages if name != 'total' and name not in self.count_names), key=lambda name: -averages[name])
+        for name in phases[:lines]:
+            texts.append('%-18s %.2f' % (name, averages[name]))
+        texts.append(' '.join('%s %d' % (name, averages[name]) for name in self.count_names if name in averages))
+
+        y = pos[1]
+        for text in texts:
+            img = self.font.render(text, False, (255, 255, 255), (0, 0, 0))
+            surf.blit(img, (pos[0], y))
+            y += img.get_height()
@@ -0,0 +1,123 @@
+from array import array
+
+from scripts.outline import outline_image
+
+class ProjectileSystem:
+    """
+    the enemies' bullets, in fixed size arrays that are made once (a pool)
+    projectile i is xs[i], ys[i], directions[i], timers[i] for i < count
+
+    adding a projectile just writes into the next free slot
+    update() moves them all, checks them all against the walls in one go (solid grid)
+    and against the player rect (made once, not once per bullet)
+    the ones that are done are packed out in the same pass, the rest keep their order
+
+    the game doesn't get called back, update() gives back a list of hit events
+    {'type': 'wall', 'pos': [x, y], 'direction': direction}
+    {'type': 'player', 'pos': [x, y]}
+    so the game decides the sparks, sounds and screenshake
+    """
+    def __init__(self, capacity=1024, max_age=360):
+        self.capacity = capacity
+        # frames a projectile flies before it is taken out (6 secs)
+        self.max_age = max_age
+        self.xs = array('d', [0.0]) * capacity
+        self.ys = array('d', [0.0]) * capacity
+        self.directions = array('d', [0.0]) * capacity
+        self.timers = array('i', [0]) * capacity
+        self.count = 0
+
+        # projectiles that didn't fit in the pool
+        self.dropped = 0
+        self.hits = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def add(self, pos, direction):
+        # returns False when the pool is full, the projectile is not fired
+        if self.count == self.capacity:
+            self.dropped += 1
+            return False
+        i = self.count
+        self.xs[i] = pos[0]
+        self.ys[i] = pos[1]
+        self.directions[i] = direction
+        self.timers[i] = 0
+        self.count += 1
+        return True
+
+    def positions(self):
+        return [(self.xs[i], self.ys[i]) for i in range(self.count)]
+
+    def update(self, tilemap, player_rect=None):
+        """
+        player_rect -> rect the projectiles can hit, None when the player can't be hit (dashing)
+        returns the hit events in projectile order
+        """
+        xs = self.xs
+        ys = self.ys
+        directions = self.directions
+        timers = self.timers
+        count = self.count
+        max_age = self.max_age
+
+        # move them all first, nothing below changes how they move
+        for i in range(count):
+            xs[i] += directions[i]
+            timers[i] += 1
+
+        # check if the location of each projectile is a solid tile (wall)
+        walls = tilemap.solid_check_batch(xs, ys, count)
+
+        if player_rect:
+            # same test as Rect.collidepoint(), which cuts the point down to ints
+            left = player_rect.left
+            right = player_rect.right
+            top = player_rect.top
+            bottom = player_rect.bottom
+
+        events = []
+        # slot the next projectile that stays goes into
+        kept = 0
+        for i in range(count):
+            x = xs[i]
+            y = ys[i]
+            if walls[i]:
+                events.append({'type': 'wall', 'pos': [x, y], 'direction': directions[i]})
+                continue
+            # when the projectile flies off the map
+            if timers[i] > max_age:
+                continue
+            if player_rect and left <= int(x) < right and top <= int(y) < bottom:
+                events.append({'type': 'player', 'pos': [x, y]})
+                continue
+            if kept != i:
+                xs[kept] = x
+                ys[kept] = y
+                directions[kept] = directions[i]
+                timers[kept] = timers[i]
+            kept += 1
+
+        self.count = kept
+        self.hits += len(events)
+        return events
+
+    # outline -> surface the dark outline goes on, None for no outline
+    def render(self, surf, img, offset=(0, 0), outline=None):
+        # img.get_width() / 2 = top center
+        # if the projectile doesn't appear, you got the camera stuff wrong
+        # think about how the camera should apply to the thing you are working on
+        half_w = img.get_width() / 2
+        half_h = img.get_height() / 2
+        xs = self.xs
+        ys = self.ys
+        blits = [(img, (xs[i] - half_w - offset[0], ys[i] - half_h - offset[1])) for i in range(self.count)]
+        surf.blits(blits, doreturn=False)
+        if outline:
+            outline_img = outline_image(img)
+            # blit cuts the position down to ints, the outline goes 1 pixel up and left of that
+            outline.blits([(outline_img, (int(blit[1][0]) - 1, int(blit[1][1]) - 1)) for blit in blits], doreturn=False)
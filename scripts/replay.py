@@ -0,0 +1,131 @@
+"""
+deterministic runs: seeded random numbers, input recording (.rpl) and replay
+
+the game takes its random numbers from RandomStreams, one random.Random per part of the game
+all made from one seed, so the same seed and the same inputs give the same game
+(and effects taking more or fewer numbers can't change where the enemies walk)
+
+everything is little endian
+header -> magic, version, tick rate, start level, seed, tick count, size of the inputs
+inputs -> one byte per tick (LEFT | RIGHT | JUMP | DASH bits), zlib compressed
+hashes -> uint32 per tick, state hash after the tick (Game.state_hash)
+"""
+
+import sys
+import zlib
+import random
+import struct
+from array import array
+
+MAGIC = b'PRPL'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHIII')
+
+# bits of an input byte
+LEFT = 1
+RIGHT = 2
+JUMP = 4
+DASH = 8
+
+class RandomStreams:
+    """
+    enemies  -> walking decisions (changes the game)
+    leaves   -> when and where the trees drop leaves
+    effects  -> sparks and particles
+    clouds   -> where the clouds start
+    shake    -> screenshake offset
+    governor -> which leaves get dropped when the game runs slow (depends on frame times)
+    """
+    NAMES = ('enemies', 'leaves', 'effects', 'clouds', 'shake', 'governor')
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        # the replay header keeps the seed in 32 bits (-5 -> 4294967291)
+        seed = seed % 2 ** 32
+        self.seed = seed
+        for name in self.NAMES:
+            # random.Random('...') seeds from the text itself, so it is the same every run
+            setattr(self, name, random.Random('%d:%s' % (seed, name)))
+
+def pack_inputs(movement, jump, dash):
+    return (LEFT if movement[0] else 0) | (RIGHT if movement[1] else 0) | (JUMP if jump else 0) | (DASH if dash else 0)
+
+def unpack_inputs(byte):
+    # -> the inputs step() takes
+    return {'movement': [bool(byte & LEFT), bool(byte & RIGHT)], 'jump': bool(byte & JUMP), 'dash': bool(byte & DASH)}
+
+def hash_state(values):
+    # values -> tuple of numbers, strings, ... repr of floats is exact so any change shows up
+    return zlib.crc32(repr(values).encode())
+
+class InputRecorder:
+    # the inputs every tick ran with and the state hash after it
+    def __init__(self, seed, level=0, tick_rate=60):
+        self.seed = seed
+        self.level = level
+        self.tick_rate = tick_rate
+        self.inputs = bytearray()
+        self.hashes = array('I')
+
+    def record(self, movement, jump, dash, state_hash):
+        self.inputs.append(pack_inputs(movement, jump, dash))
+        self.hashes.append(state_hash)
+
+    def save(self, path):
+        inputs = zlib.compress(bytes(self.inputs), 9)
+        hashes = array('I', self.hashes)
+        if sys.byteorder != 'little':
+            hashes.byteswap()
+        f = open(path, 'wb')
+        f.write(HEADER.pack(MAGIC, VERSION, self.tick_rate, self.level, self.seed, len(self.inputs), len(inputs)))
+        f.write(inputs)
+        f.write(hashes.tobytes())
+        f.close()
+
+class Replay:
+    """
+    a recording played back: inputs(tick) for step(), check(tick, hash) after it
+    mismatch -> first tick where the state came out different (None while it matches)
+    """
+    def __init__(self, seed, level, tick_rate, inputs, hashes):
+        self.seed = seed
+        self.level = level
+        self.tick_rate = tick_rate
+        self.inputs = inputs
+        self.hashes = hashes
+        self.checked = 0
+        self.mismatch = None
+
+    def done(self, tick):
+        return tick >= len(self.inputs)
+
+    def inputs_at(self, tick):
+        return unpack_inputs(self.inputs[tick])
+
+    def check(self, tick, state_hash):
+        if tick >= len(self.hashes):
+            return True
+        self.checked += 1
+        if state_hash != self.hashes[tick]:
+            if self.mismatch is None:
+                self.mismatch = tick
+            return False
+        return True
+
+def load_replay(path):
+    f = open(path, 'rb')
+    data = f.read()
+    f.close()
+    magic, version, tick_rate, level, seed, ticks, size = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(path + ' is not a replay this game can read')
+    start = HEADER.size
+    inputs = bytearray(zlib.decompress(data[start:start + size]))
+    hashes = array('I')
+    hashes.frombytes(data[start + size:start + size + ticks * 4])
+    if sys.byteorder != 'little':
+        hashes.byteswap()
+    if len(inputs) != ticks or len(hashes) != ticks:
+        raise ValueError(path + ' is cut short')
+    return Replay(seed, level, tick_rate, inputs, hashes)
@@ -2,11 +2,35 @@ import math
 
 import pygame
 
-class Spark:
-    def __init__(self, pos, angle,speed):
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
+from scripts.outline import OUTLINE_COLOR, OUTLINE_OFFSETS
+
+class SparkSystem:
+    """
+    every spark in the game, kept as columns like the ParticleSystem
+    spark i is xs[i], ys[i], coss[i], sins[i], speeds[i]
+
+    a spark never turns, so cos(angle) and sin(angle) are worked out once when it is added
+    instead of ten times a frame (update + the 4 points of render)
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.xs = []
+        self.ys = []
+        self.coss = []
+        self.sins = []
+        self.speeds = []
+
+    def __len__(self):
+        return len(self.xs)
+
+    def add(self, pos, angle, speed):
+        self.xs.append(pos[0])
+        self.ys.append(pos[1])
+        self.coss.append(math.cos(angle))
+        self.sins.append(math.sin(angle))
+        self.speeds.append(speed)
 
     def update(self):
         """
@@ -24,30 +48,96 @@ class Spark:
         -> cos(angle) for x-axis * speed (for length)
         -> sin(angle) for y-axis * speed (for length)
         """
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
+        xs = self.xs
+        ys = self.ys
+        coss = self.coss
+        sins = self.sins
+        speeds = self.speeds
+
+        # slot the next spark that stays goes into, packed in place like the particles
+        kept = 0
+        for i in range(len(xs)):
+            speed = speeds[i]
+            x = xs[i] + coss[i] * speed
+            y = ys[i] + sins[i] * speed
+
+            # speed shrinks to 0
+            speed = max(0, speed - 0.1)
+            # once the speed is zero the spark is taken out
+            if not speed:
+                continue
+
+            xs[kept] = x
+            ys[kept] = y
+            speeds[kept] = speed
+            if kept != i:
+                coss[kept] = coss[i]
+                sins[kept] = sins[i]
+            kept += 1
 
-        # speed shrinks to 0
-        self.speed = max(0, self.speed - 0.1)
+        if kept < len(xs):
+            del xs[kept:]
+            del ys[kept:]
+            del coss[kept:]
+            del sins[kept:]
+            del speeds[kept:]
 
-        # once the speed is zero, we return true which removes it from the list of sparks
-        return not self.speed
-    
-    def render(self, surf, offset=(0, 0)):
-        # creating a thin diamond shape based on the angle of the spark
-        # facing right -> horizontal spark
-        # facing up -> verticle spark
-        # other directions
-        render_points = [
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[1]),
-            (self.pos[0] + math.cos(self.angle + math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle + math.pi) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[1])
-        ]
+    def polygons(self, offset=(0, 0)):
+        """
+        creating a thin diamond shape based on the angle of the spark
+        facing right -> horizontal spark
+        facing up -> verticle spark
+        other directions
+
+        the points are front, left side, back, right side
+        angle + pi is (-cos, -sin), angle +- pi/2 is (-sin, cos) and (sin, -cos)
+        """
+        ox = offset[0]
+        oy = offset[1]
+        polygons = []
+        for x, y, c, s, speed in zip(self.xs, self.ys, self.coss, self.sins, self.speeds):
+            x -= ox
+            y -= oy
+            long_x = c * speed * 3
+            long_y = s * speed * 3
+            side_x = s * speed * 0.5
+            side_y = c * speed * 0.5
+            polygons.append(((x + long_x, y + long_y), (x - side_x, y + side_y), (x - long_x, y - long_y), (x + side_x, y - side_y)))
+        return polygons
 
+    # outline -> surface the dark outline goes on, None for no outline
+    def render(self, surf, offset=(0, 0), outline=None):
         """
         takes a surface to render to            -> surf
         takes a color                           -> white
         list of points that creates the polygon -> render_points
         """
-        pygame.draw.polygon(surf, (255, 255, 255), render_points)
+        polygons = self.polygons(offset)
+        for render_points in polygons:
+            pygame.draw.polygon(surf, (255, 255, 255), render_points)
+
+        if outline and polygons:
+            self.render_outline(outline, polygons)
+
+    def render_outline(self, outline, polygons):
+        """
+        sparks change shape every frame so their outline can't be made once like the sprites
+        the sparks are drawn again on a surface just big enough for them (on screen)
+        and the outline is made from that, so it only costs as much as the sparks cover
+        """
+        xs = [point[0] for render_points in polygons for point in render_points]
+        ys = [point[1] for render_points in polygons for point in render_points]
+        # 1 pixel around for the outline, cut to the screen like a mask of the screen would be
+        left = max(0, int(math.floor(min(xs))) - 1)
+        top = max(0, int(math.floor(min(ys))) - 1)
+        right = min(outline.get_width(), int(math.ceil(max(xs))) + 2)
+        bottom = min(outline.get_height(), int(math.ceil(max(ys))) + 2)
+        if right <= left or bottom <= top:
+            return
+
+        layer = pygame.Surface((right - left, bottom - top), pygame.SRCALPHA)
+        for render_points in polygons:
+            pygame.draw.polygon(layer, (255, 255, 255), [(x - left, y - top) for x, y in render_points])
+        silhouette = pygame.mask.from_surface(layer).to_surface(setcolor=OUTLINE_COLOR, unsetcolor=(0, 0, 0, 0))
+        for offset in OUTLINE_OFFSETS:
+            outline.blit(silhouette, (left + offset[0], top + offset[1]))
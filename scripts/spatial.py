@@ -0,0 +1,97 @@
+class SpatialHash:
+    """
+    uniform grid of buckets for things that have a rect in pixel space
+
+    every item goes into each cell_size x cell_size bucket its rect touches
+    asking "what is in this rect" only looks in the buckets the rect touches
+    so the cost depends on how much is in that area, not on how much is in the level
+
+    items come back in the order they were inserted
+    (off grid tiles are drawn in that order so it matters)
+    """
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        # (cell x, cell y) -> {insert number: item}
+        self.buckets = {}
+        # insert number -> item, in insert order
+        self.items = {}
+        # insert number -> rect
+        self.rects = {}
+        # id(item) -> insert number
+        # tile dicts can't be dict keys so we go by the object itself
+        self.ids = {}
+        self.next_id = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(list(self.items.values()))
+
+    def __contains__(self, item):
+        return id(item) in self.ids
+
+    def clear(self):
+        self.buckets = {}
+        self.items = {}
+        self.rects = {}
+        self.ids = {}
+
+    def copy(self):
+        # the rects and items are shared, the buckets are new
+        other = SpatialHash(self.cell_size)
+        other.buckets = {cell: dict(bucket) for cell, bucket in self.buckets.items()}
+        other.items = dict(self.items)
+        other.rects = dict(self.rects)
+        other.ids = dict(self.ids)
+        other.next_id = self.next_id
+        return other
+
+    def cells(self, rect):
+        # every bucket the rect touches
+        for cx in range(rect.left // self.cell_size, (rect.right - 1) // self.cell_size + 1):
+            for cy in range(rect.top // self.cell_size, (rect.bottom - 1) // self.cell_size + 1):
+                yield (cx, cy)
+
+    def insert(self, item, rect):
+        num = self.next_id
+        self.next_id += 1
+        self.items[num] = item
+        self.rects[num] = rect
+        self.ids[id(item)] = num
+        for cell in self.cells(rect):
+            if cell not in self.buckets:
+                self.buckets[cell] = {}
+            self.buckets[cell][num] = item
+        return num
+
+    def remove(self, item):
+        num = self.ids.pop(id(item), None)
+        if num is None:
+            return False
+        del self.items[num]
+        for cell in self.cells(self.rects.pop(num)):
+            bucket = self.buckets[cell]
+            del bucket[num]
+            if not bucket:
+                del self.buckets[cell]
+        return True
+
+    def query(self, rect):
+        # items whose rect overlaps rect
+        found = {}
+        for cell in self.cells(rect):
+            bucket = self.buckets.get(cell)
+            if bucket:
+                for num in bucket:
+                    if num not in found and self.rects[num].colliderect(rect):
+                        found[num] = bucket[num]
+        return [found[num] for num in sorted(found)]
+
+    def query_point(self, pos):
+        # items whose rect has pos inside of it
+        cell = (int(pos[0] // self.cell_size), int(pos[1] // self.cell_size))
+        bucket = self.buckets.get(cell)
+        if not bucket:
+            return []
+        return [bucket[num] for num in sorted(bucket) if self.rects[num].collidepoint(pos)]
@@ -0,0 +1,132 @@
+import math
+import heapq
+import random
+
+import pygame
+
+try:
+    from scripts.spatial import SpatialHash
+except ModuleNotFoundError:
+    # the editor runs from inside scripts/ so there is no scripts package to import from
+    from spatial import SpatialHash
+
+class SpawnScheduler:
+    """
+    decides when each spawner rect (the trees) spawns something
+
+    the old way rolled random.random() * 49999 < area for every rect every frame
+    -> a chance of area / 49999 each frame, even for trees nowhere near the camera
+
+    here only the rects near the camera are looked at (SpatialHash)
+    and instead of rolling every frame, each one draws the frame of its next spawn
+    (how many frames until the next hit of an area / 49999 chance is a geometric distribution)
+
+    the rects near the camera are only looked up again when the camera (+ reach) touches
+    other SpatialHash cells, so while it stays in the same cells a frame is one compare
+    the next spawns are kept in a heap (soonest first) -> a frame with nothing to spawn
+    only looks at the top of it
+
+    reach    -> how far (pixels) a spawned thing can travel into view before it dies
+                rects further than that from the camera can't put anything on screen
+    lifetime -> most frames a spawned thing lives
+
+    when a rect comes near the camera, the spawns it would have made in the last
+    lifetime frames are made too, already aged (age = frames they would have been alive)
+    so walking up to a tree looks the same as if it had been spawning the whole time
+    (only back to the last frame it was near the camera, those spawns are still around)
+
+    rng -> where the random numbers come from, the random module or a random.Random
+    """
+    def __init__(self, rects, chance_divisor=49999, reach=128, lifetime=360, cell_size=128, rng=random):
+        self.rects = list(rects)
+        self.rng = rng
+        self.reach = reach
+        self.lifetime = lifetime
+
+        # log(1 - chance) for each rect, None when it can't spawn, 0 when it spawns every frame
+        self.log_miss = []
+        self.index = SpatialHash(cell_size)
+        for i, rect in enumerate(self.rects):
+            chance = rect.width * rect.height / chance_divisor
+            if chance <= 0:
+                self.log_miss.append(None)
+                continue
+            self.log_miss.append(math.log(1 - chance) if chance < 1 else 0.0)
+            self.index.insert(i, rect)
+
+        # cells the camera + reach touched last time we looked, (left, top, right, bottom)
+        self.cells = None
+        # (frame of its next spawn, rect number) for the rects near the camera, a heap
+        self.next_spawns = []
+        # rect number -> last frame it was near the camera (only for rects that went away)
+        self.last_seen = {}
+        self.tick = 0
+
+        self.spawned = 0
+        self.backfilled = 0
+
+    def gap(self, i):
+        # frames until the next spawn, 1 -> next frame
+        log_miss = self.log_miss[i]
+        if not log_miss:
+            return 1
+        return 1 + int(math.log(1 - self.rng.random()) / log_miss)
+
+    def point(self, i):
+        # gives us any position in the rect
+        rect = self.rects[i]
+        return (rect.x + self.rng.random() * rect.width, rect.y + self.rng.random() * rect.height)
+
+    def update(self, view):
+        """
+        once a frame
+        view -> the camera rect in world pixels
+        returns [(pos, age)] for the things to spawn this frame
+        """
+        self.tick += 1
+        tick = self.tick
+        spawns = []
+
+        size = self.index.cell_size
+        reach = self.reach
+        cells = ((view.left - reach) // size, (view.top - reach) // size,
+                 (view.right + reach - 1) // size, (view.bottom + reach - 1) // size)
+        if cells != self.cells:
+            self.cells = cells
+            self.activate(cells, tick, spawns)
+
+        next_spawns = self.next_spawns
+        while next_spawns and next_spawns[0][0] <= tick:
+            i = next_spawns[0][1]
+            spawns.append((self.point(i), 0))
+            heapq.heapreplace(next_spawns, (tick + self.gap(i), i))
+
+        self.spawned += len(spawns)
+        return spawns
+
+    def activate(self, cells, tick, spawns):
+        # the camera moved into other cells -> find the rects near it again
+        size = self.index.cell_size
+        area = pygame.Rect(cells[0] * size, cells[1] * size, (cells[2] - cells[0] + 1) * size, (cells[3] - cells[1] + 1) * size)
+        # rect number -> frame of its next spawn, for the rects that were near the camera
+        old = {i: when for when, i in self.next_spawns}
+
+        next_spawns = []
+        for i in self.index.query(area):
+            when = old.pop(i, None)
+            if when is None:
+                # just came near the camera -> the spawns from the frames it was away
+                # nothing has been spawning before the first frame (level start)
+                start = max(tick - self.lifetime, self.last_seen.get(i, 0) + 1, 1)
+                when = start - 1 + self.gap(i)
+                while when < tick:
+                    spawns.append((self.point(i), tick - when))
+                    self.backfilled += 1
+                    when += self.gap(i)
+            next_spawns.append((when, i))
+
+        # rects that moved away from the camera are forgotten, last frame they were near is kept
+        for i in old:
+            self.last_seen[i] = tick - 1
+        heapq.heapify(next_spawns)
+        self.next_spawns = next_spawns
@@ -0,0 +1,184 @@
+import queue
+import threading
+
+try:
+    from scripts.chunkgrid import ChunkGrid, CHUNK_SHIFT, CHUNK_MASK, CHUNK_SIZE, EMPTY
+    from scripts import levelfile
+except ModuleNotFoundError:
+    from chunkgrid import ChunkGrid, CHUNK_SHIFT, CHUNK_MASK, CHUNK_SIZE, EMPTY
+    import levelfile
+
+class StreamedGrid(ChunkGrid):
+    """
+    a ChunkGrid where only the chunks near the camera are in memory
+    the rest stay in the .lvl file until the ChunkStreamer pages them in
+
+    a lookup on a chunk that is in the file but not loaded yet loads it right away
+    so physics (solid_check, collide, ...) never sees a missing chunk as empty air
+    """
+    def __init__(self, solid_types, streamer):
+        super().__init__(solid_types)
+        self.streamer = streamer
+        # chunks that are in the file but not in memory
+        self.unloaded = set()
+        # chunks that were changed, they are not thrown away (the change would be lost)
+        self.modified = set()
+
+    def get(self, x, y):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if key not in self.unloaded:
+                return EMPTY
+            chunk = self.streamer.load_now(key)
+            if chunk is None:
+                return EMPTY
+        return chunk[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+
+    def solid(self, x, y):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        chunk = self.solid_chunks.get(key)
+        if chunk is None:
+            if key not in self.unloaded:
+                return 0
+            self.streamer.load_now(key)
+            chunk = self.solid_chunks.get(key)
+            if chunk is None:
+                return 0
+        return chunk[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+
+    def load_all(self):
+        # for things that go over the whole level (save, extract, autotile)
+        # the chunks that aren't modified are thrown away again by the next ChunkStreamer.update()
+        for key in list(self.unloaded):
+            self.streamer.load_now(key)
+
+    def items(self):
+        # every tile of the level, not only the ones near the camera
+        self.load_all()
+        return super().items()
+
+    def chunk_items(self, key):
+        # about to be drawn, don't draw it empty because the thread is still reading it
+        if key in self.unloaded:
+            self.streamer.load_now(key)
+        return super().chunk_items(key)
+
+    def set(self, x, y, tile_type, variant):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        if key in self.unloaded:
+            self.streamer.load_now(key)
+        self.modified.add(key)
+        return super().set(x, y, tile_type, variant)
+
+    def remove(self, x, y):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        if key in self.unloaded:
+            self.streamer.load_now(key)
+        self.modified.add(key)
+        return super().remove(x, y)
+
+class ChunkStreamer:
+    """
+    pages the chunks of a .lvl file in and out around the camera
+
+    update() once a frame:
+    -> takes the chunks the loader thread finished reading and puts them in the grid
+    -> asks the loader thread for the chunks within radius chunks of the screen (ahead of time)
+    -> throws away chunks more than radius + 1 chunks away (the + 1 stops chunks on the edge
+       from being loaded and thrown away over and over)
+
+    only the chunk index and the off grid tiles stay in memory for the whole level
+    """
+    def __init__(self, tilemap, path, radius=1):
+        self.tilemap = tilemap
+        self.path = path
+        self.radius = radius
+
+        index = levelfile.read_index(path)
+        self.tile_size = index['tile_size']
+        self.offsets = index['offsets']
+        self.offgrid = index['offgrid']
+
+        self.grid = StreamedGrid(tilemap.tilemap.solid_types, self)
+        for tile_type in index['types']:
+            self.grid.type_id(tile_type)
+        self.grid.unloaded = set(self.offsets)
+
+        # chunks asked for but not back from the loader thread yet
+        self.pending = set()
+        self.requests = queue.Queue()
+        self.ready = queue.Queue()
+        # each thread needs its own file, they seek around in it
+        self.file = open(path, 'rb')
+        self.thread = threading.Thread(target=self.loader, daemon=True)
+        self.thread.start()
+
+        self.loads = 0
+        self.evictions = 0
+
+    def loader(self):
+        # background thread, just reads chunk cells from the file
+        f = open(self.path, 'rb')
+        while True:
+            key = self.requests.get()
+            if key is None:
+                break
+            self.ready.put((key, levelfile.read_chunk(f, self.offsets[key])))
+        f.close()
+
+    def close(self):
+        self.requests.put(None)
+        self.file.close()
+
+    def add(self, key, cells):
+        self.grid.unloaded.discard(key)
+        self.grid.add_chunk(key, cells)
+        # the chunk might have been baked while it wasn't here
+        self.tilemap.cache.invalidate_chunk(key)
+        self.loads += 1
+
+    def load_now(self, key):
+        # something needs the chunk this frame, can't wait for the thread
+        self.add(key, levelfile.read_chunk(self.file, self.offsets[key]))
+        return self.grid.chunks.get(key)
+
+    def chunks_around(self, rect, radius):
+        size = CHUNK_SIZE * self.tile_size
+        keys = set()
+        for cx in range(rect[0] // size - radius, (rect[0] + rect[2]) // size + radius + 1):
+            for cy in range(rect[1] // size - radius, (rect[1] + rect[3]) // size + radius + 1):
+                keys.add((cx, cy))
+        return keys
+
+    def update(self, scroll, view_size, anchors=()):
+        """
+        scroll    -> camera offset
+        view_size -> size of the display
+        anchors   -> pixel positions that have to keep their chunk (entities)
+        """
+        while True:
+            try:
+                key, cells = self.ready.get_nowait()
+            except queue.Empty:
+                break
+            self.pending.discard(key)
+            # could have been loaded with load_now() while the thread was reading it
+            if key in self.grid.unloaded:
+                self.add(key, cells)
+
+        view = (int(scroll[0]), int(scroll[1]), view_size[0], view_size[1])
+        for key in self.chunks_around(view, self.radius):
+            if key in self.grid.unloaded and key not in self.pending:
+                self.pending.add(key)
+                self.requests.put(key)
+
+        keep = self.chunks_around(view, self.radius + 1)
+        for pos in anchors:
+            keep.add((int(pos[0] // self.tile_size) >> CHUNK_SHIFT, int(pos[1] // self.tile_size) >> CHUNK_SHIFT))
+        for key in list(self.grid.chunks):
+            if key not in keep and key not in self.grid.modified and key in self.offsets:
+                self.grid.drop_chunk(key)
+                self.grid.unloaded.add(key)
+                self.tilemap.cache.invalidate_chunk(key)
+                self.evictions += 1
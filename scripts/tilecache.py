@@ -0,0 +1,95 @@
+import math
+
+import pygame
+
+try:
+    from scripts.chunkgrid import CHUNK_SIZE, CHUNK_SHIFT
+    from scripts.outline import make_outline
+except ModuleNotFoundError:
+    from chunkgrid import CHUNK_SIZE, CHUNK_SHIFT
+    from outline import make_outline
+
+class TileCache:
+    """
+    tiles almost never change during play
+    so instead of blitting every visible tile every frame
+    we draw all the tiles of a chunk onto one surface once (bake)
+    and blit only the few chunk surfaces that the camera can see
+
+    when a tile is added or removed only the chunk it is in gets baked again
+
+    the outline of a chunk is made from the baked surface the first time it is asked for
+    the chunks don't overlap, so their outlines add up to the outline of all the tiles
+    """
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+        # (chunk x, chunk y) -> baked surface, None if there is nothing to draw in the chunk
+        self.chunks = {}
+        # (chunk x, chunk y) -> outline of the baked surface
+        self.outlines = {}
+
+    def chunk_pixels(self):
+        # width/height of a chunk in pixels
+        return CHUNK_SIZE * self.tilemap.tile_size
+
+    def clear(self):
+        self.chunks = {}
+        self.outlines = {}
+
+    # tile coordinates of a grid tile
+    def invalidate_tile(self, x, y):
+        self.invalidate_chunk((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+
+    def invalidate_chunk(self, key):
+        self.chunks.pop(key, None)
+        self.outlines.pop(key, None)
+
+    # pixel rect, for off grid tiles that can cover more than one chunk
+    def invalidate_rect(self, rect):
+        size = self.chunk_pixels()
+        for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+            for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                self.invalidate_chunk((cx, cy))
+
+    def bake(self, key):
+        size = self.chunk_pixels()
+        chunk_rect = pygame.Rect(key[0] * size, key[1] * size, size, size)
+        assets = self.tilemap.game.assets
+        surf = None
+
+        # off grid first so grid tiles are drawn on top, same as before
+        for tile in self.tilemap.offgrid_in_rect(chunk_rect):
+            if not surf:
+                surf = pygame.Surface((size, size), pygame.SRCALPHA)
+            # off grid tiles can sit on half pixels, blit cuts the .5 off towards 0
+            # floor them so a tile split over two chunks lines up on both sides
+            surf.blit(assets[tile['type']][tile['variant']], (math.floor(tile['pos'][0]) - chunk_rect.x, math.floor(tile['pos'][1]) - chunk_rect.y))
+
+        # on grid
+        tile_size = self.tilemap.tile_size
+        for x, y, packed in self.tilemap.tilemap.chunk_items(key):
+            if not surf:
+                surf = pygame.Surface((size, size), pygame.SRCALPHA)
+            tile_type, variant = self.tilemap.tilemap.unpack(packed)
+            surf.blit(assets[tile_type][variant], (x * tile_size - chunk_rect.x, y * tile_size - chunk_rect.y))
+
+        self.chunks[key] = surf
+        return surf
+
+    # outline -> surface to draw the chunk outlines on, None for no outlines
+    def render(self, surf, offset=(0, 0), outline=None):
+        size = self.chunk_pixels()
+        # same idea as the on grid optimization in Tilemap.render, but with chunks instead of tiles
+        for cx in range(offset[0] // size, (offset[0] + surf.get_width()) // size + 1):
+            for cy in range(offset[1] // size, (offset[1] + surf.get_height()) // size + 1):
+                key = (cx, cy)
+                if key in self.chunks:
+                    chunk_surf = self.chunks[key]
+                else:
+                    chunk_surf = self.bake(key)
+                if chunk_surf:
+                    surf.blit(chunk_surf, (cx * size - offset[0], cy * size - offset[1]))
+                    if outline:
+                        if key not in self.outlines:
+                            self.outlines[key] = make_outline(chunk_surf)
+                        outline.blit(self.outlines[key], (cx * size - offset[0] - 1, cy * size - offset[1] - 1))
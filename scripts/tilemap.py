@@ -1,7 +1,25 @@
 
-import pygame
+import math
 import json
 
+import pygame
+
+try:
+    from scripts.chunkgrid import ChunkGrid
+    from scripts.tilecache import TileCache
+    from scripts.spatial import SpatialHash
+    from scripts import levelfile
+    from scripts.autotile import Autotiler
+    from scripts.streaming import ChunkStreamer
+except ModuleNotFoundError:
+    # the editor runs from inside scripts/ so there is no scripts package to import from
+    from chunkgrid import ChunkGrid
+    from tilecache import TileCache
+    from spatial import SpatialHash
+    import levelfile
+    from autotile import Autotiler
+    from streaming import ChunkStreamer
+
 AUTOTILE_MAP = {
     # if these are neighbors, use tile 0
     tuple(sorted([(1, 0), (0, 1)])): 0,
@@ -25,38 +43,99 @@ class Tilemap:
         self.tile_size = tile_size
         # every tiles in the grid
         # {(0, 0): 'grass', (0, 1): 'dirt', ...., (999, 0): 'grass'}
-        # {'0;0': 'grass', '0;1': 'dirt', ...., '999;0': 'grass'}
-        self.tilemap = {}
+        # stored in integer keyed chunks, json still uses {'0;0': {...}, ...}
+        self.tilemap = ChunkGrid(solid_types=PHYSICS_TILES)
         # tiles that doesn't line up with the grid
-        self.offgrid_tiles = []
+        # kept in a spatial hash so we can ask for the ones in an area
+        self.offgrid = SpatialHash(cell_size=tile_size * 4)
+        # baked chunk surfaces used by render()
+        self.cache = TileCache(self)
+        # the memory mapped .lvl file the tiles come from, if any
+        self.mapped_file = None
+        # keeps track of edited tiles so autotile(full=False) only redoes those
+        self.autotiler = Autotiler(self, AUTOTILE_MAP, AUTOTILE_TYPES)
+        # pages chunks in and out around the camera for streamed levels (see streaming.py)
+        self.streamer = None
+
+    # list of off grid tiles in the order they were placed
+    @property
+    def offgrid_tiles(self):
+        return list(self.offgrid)
+
+    @offgrid_tiles.setter
+    def offgrid_tiles(self, tiles):
+        self.offgrid.clear()
+        for tile in tiles:
+            self.offgrid.insert(tile, self.offgrid_rect(tile))
+        self.cache.clear()
 
     # id_pairs = [(tile type, variant)]
     def extract(self, id_pairs, keep=False):
         matches = []
         # off grid
-        for tile in self.offgrid_tiles.copy():
+        for tile in self.offgrid_tiles:
             if (tile['type'], tile['variant']) in id_pairs:
                 matches.append(tile.copy())
                 if not keep:
-                    self.offgrid_tiles.remove(tile)
+                    self.remove_offgrid(tile)
         # on grid
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
-            if (tile['type'], tile['variant']) in id_pairs:
-                matches.append(tile.copy())
-                # tile dict is in tile corridnates for the grid
+        for x, y, packed in self.tilemap.items():
+            tile_type, variant = self.tilemap.unpack(packed)
+            if (tile_type, variant) in id_pairs:
+                # tile is in tile corridnates for the grid
                 # we need pixel coordinates
-                matches[-1]['pos'] = matches[-1]['pos'].copy()
-                # convert to pixel corrdinate x-pos
-                matches[-1]['pos'][0] *= self.tile_size
-                # convert to pixel corrdinate y-pos
-                matches[-1]['pos'][1] *= self.tile_size
+                matches.append({'type': tile_type, 'variant': variant,
+                                'pos': [x * self.tile_size, y * self.tile_size]})
 
                 if not keep:
-                    del self.tilemap[loc]
+                    self.remove_tile(x, y)
 
         return matches
 
+    # tile dict at a grid location or None
+    def get_tile(self, x, y):
+        return self.tilemap.tile(x, y)
+
+    # change tiles through these so the baked chunks get redrawn
+    def set_tile(self, x, y, tile_type, variant):
+        if self.tilemap.set(x, y, tile_type, variant):
+            self.cache.invalidate_tile(x, y)
+            self.autotiler.mark(x, y)
+
+    def remove_tile(self, x, y):
+        if self.tilemap.remove(x, y):
+            self.cache.invalidate_tile(x, y)
+            self.autotiler.mark(x, y)
+            return True
+        return False
+
+    # pixel rect that an off grid tile covers
+    def offgrid_rect(self, tile):
+        # the game doesn't load images for tiles it never draws (spawners)
+        # those get a tile sized rect
+        if tile['type'] in self.game.assets:
+            size = self.game.assets[tile['type']][tile['variant']].get_size()
+        else:
+            size = (self.tile_size, self.tile_size)
+        return pygame.Rect(math.floor(tile['pos'][0]), math.floor(tile['pos'][1]), size[0], size[1])
+
+    # off grid tiles that overlap a pixel rect (camera, chunk, ...)
+    def offgrid_in_rect(self, rect):
+        return self.offgrid.query(rect)
+
+    # off grid tiles under a pixel pos (mouse, ...)
+    def offgrid_at(self, pos):
+        return self.offgrid.query_point(pos)
+
+    def add_offgrid(self, tile):
+        rect = self.offgrid_rect(tile)
+        self.offgrid.insert(tile, rect)
+        self.cache.invalidate_rect(rect)
+
+    def remove_offgrid(self, tile):
+        if self.offgrid.remove(tile):
+            self.cache.invalidate_rect(self.offgrid_rect(tile))
+
     # get all the tiles around the player
     # you pass in a pixel pos
     def tiles_around(self, pos):
@@ -65,37 +144,128 @@ class Tilemap:
         # grid tiles are not pixels so have to convert the pixel pos to a grid pos
         tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
         for offset in NEIGHBOR_OFFSETS:
-            check_loc = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
+            tile = self.tilemap.tile(tile_loc[0] + offset[0], tile_loc[1] + offset[1])
+            if tile:
+                tiles.append(tile)
         return tiles
     
     def solid_check(self, pos):
-        # get location
-        tile_loc = str(int(pos[0] // self.tile_size)) + ';' + str(int(pos[1] // self.tile_size))
-        # check if tile exist in the location
-        if tile_loc in self.tilemap:
-            # if it does, check if it a physics tile
-            if self.tilemap[tile_loc]['type'] in PHYSICS_TILES:
-                # return the tile data
-                return self.tilemap[tile_loc]
+        # is there a physics tile at this pixel location
+        # straight from the solid grid, no tile dict
+        return bool(self.tilemap.solid(int(pos[0] // self.tile_size), int(pos[1] // self.tile_size)))
             
+    def solid_check_batch(self, xs, ys, count=None):
+        # solid_check() for a lot of points, xs[i], ys[i] for i < count
+        # gives back a bytearray, 1 where the point is in a physics tile
+        if count is None:
+            count = len(xs)
+        solid = self.tilemap.solid
+        tile_size = self.tile_size
+        return bytearray([solid(int(xs[i] // tile_size), int(ys[i] // tile_size)) for i in range(count)])
+
     # get all the tiles you can collide with
     def physics_rects_around(self, pos):
         rects = []
-        for tile in self.tiles_around(pos):
-            if tile['type'] in PHYSICS_TILES:
-                rects.append(pygame.Rect(tile['pos'][0] * self.tile_size, 
-                                         tile['pos'][1] * self.tile_size, 
+        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        for offset in NEIGHBOR_OFFSETS:
+            x = tile_loc[0] + offset[0]
+            y = tile_loc[1] + offset[1]
+            if self.tilemap.solid(x, y):
+                rects.append(pygame.Rect(x * self.tile_size, 
+                                         y * self.tile_size, 
                                          self.tile_size, self.tile_size))
 
         return rects
-    
-    def render(self, surf, offset=(0, 0)):
-         # off grid
-        for tile in self.offgrid_tiles:
-            surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
 
+    def collide(self, pos, size, axis, move):
+        """
+        same as looping over physics_rects_around(pos) and pushing the entity rect out
+        of every tile it overlaps, but with ints and the solid grid
+        no Rect or list is made
+
+        pos  -> entity pos, changed in place
+        axis -> 0 for x, 1 for y
+        move -> how far the entity moved on that axis this frame
+
+        returns 1 if we hit something moving in the + direction (right/down)
+        -1 if moving in the - direction (left/up), 0 if nothing was hit
+        """
+        value, hit = self.push_out(pos[0], pos[1], size[0], size[1], axis, move)
+        if value is not None:
+            pos[axis] = value
+        return hit
+
+    def collide_batch(self, xs, ys, sizes, moves, hits_x, hits_y):
+        """
+        moves every entity by its frame movement and does collide() on it
+        x for all of them first, then y for all of them
+        entities don't collide with each other so this gives the exact same
+        positions and hits as calling collide() on them one at a time
+
+        xs, ys         -> entity positions, changed in place
+        sizes          -> (w, h) of each entity
+        moves          -> (x, y) frame movement of each entity
+        hits_x, hits_y -> set to what collide() would return for each entity
+        """
+        push_out = self.push_out
+        count = len(xs)
+
+        # x-axis
+        for i in range(count):
+            move = moves[i][0]
+            xs[i] += move
+            value, hits_x[i] = push_out(xs[i], ys[i], sizes[i][0], sizes[i][1], 0, move)
+            if value is not None:
+                xs[i] = value
+
+        # y-axis
+        for i in range(count):
+            move = moves[i][1]
+            ys[i] += move
+            value, hits_y[i] = push_out(xs[i], ys[i], sizes[i][0], sizes[i][1], 1, move)
+            if value is not None:
+                ys[i] = value
+
+    def push_out(self, x, y, width, height, axis, move):
+        # the part collide() and collide_batch() share
+        # returns (new x or y, hit) -> new x or y is None if no tile was touched
+        tile_size = self.tile_size
+        solid = self.tilemap.solid
+        # pygame.Rect cuts floats down to ints (towards 0), do the same
+        left = int(x)
+        top = int(y)
+        tile_x = int(x // tile_size)
+        tile_y = int(y // tile_size)
+        value = None
+        hit = 0
+        for offset in NEIGHBOR_OFFSETS:
+            x = tile_x + offset[0]
+            y = tile_y + offset[1]
+            if solid(x, y):
+                tile_left = x * tile_size
+                tile_top = y * tile_size
+                # Rect.colliderect
+                if left < tile_left + tile_size and left + width > tile_left and top < tile_top + tile_size and top + height > tile_top:
+                    if axis == 0:
+                        if move > 0:
+                            left = tile_left - width
+                            hit = 1
+                        if move < 0:
+                            left = tile_left + tile_size
+                            hit = -1
+                        value = left
+                    else:
+                        if move > 0:
+                            top = tile_top - height
+                            hit = 1
+                        if move < 0:
+                            top = tile_top + tile_size
+                            hit = -1
+                        value = top
+        return value, hit
+
+    # outline -> surface the dark outline of the tiles goes on (see outline.py), None for no outline
+    def render(self, surf, offset=(0, 0), outline=None):
         # on grid optimization
         """
         without optimization:
@@ -103,49 +273,24 @@ class Tilemap:
         with optimization:
         determining which tiles should be on the screen
         rendering only those tiles
-        
-        start = offset[0] // self.tile_size
-        dividing the offset of camera by the tile size
-        gives us the top left tiles x position
 
-        end = (offset[0] + surf.get_width()) // self.tile_size + 1
-        tile coordinate of the right edge + 1
-
-        range(start, end)
+        the tiles (on grid and off grid) are baked into chunk surfaces
+        so we only need to find the chunks on the screen
+        and blit a handful of surfaces instead of every tile (see tilecache.py)
         """
-        for x in range(offset[0] // self.tile_size, (offset[0] + surf.get_width()) // self.tile_size + 1):
-            for y in range(offset[1] // self.tile_size, (offset[1] + surf.get_height()) // self.tile_size + 1):
-                loc = str(x) + ';' + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
-
-       
-        # on grid
-        # for loc in self.tilemap:
-        #    tile = self.tilemap[loc]
-            """
-            tilemap is dict(dict())
-            tile is the inside dict()
-
-            tile['type'] = 'grass' or 'stone'
-            tile['variant'] = 1 or ...
-            game.assets['stone']['variant'] = loads the 'variant'th image of stone
-
-            (x, y) coordinates
-            tile['pos'][0], tile['pos'][1]
-            
-            * self.tile_size
-            tile[pos] is pixel position
-            need them to be in grid position
-            we need to multiply by the size of tiles in terms of pixels
-            """
-        #    surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
+        self.cache.render(surf, offset=offset, outline=outline)
 
     def save(self, path):
+        # a streamed level only has the chunks near the camera in memory
+        self.tilemap.load_all()
+        # .lvl -> compact binary level (see levelfile.py)
+        if levelfile.is_level_file(path):
+            levelfile.save_level(path, self.tile_size, self.tilemap, self.offgrid_tiles)
+            return
+
         f = open(path, 'w')
         # dump the map object onto the f file as json
-        json.dump({'tilemap': self.tilemap, 
+        json.dump({'tilemap': self.tilemap.to_dict(), 
                    'tile_size': self.tile_size, 
                    'offgrid': self.offgrid_tiles}, f)
         f.close()
@@ -153,30 +298,81 @@ class Tilemap:
     # using json to store maps for level editior (java script object notations)
     # json doesn't support tuples
     # all keys in a dict() must be a string
-    def load(self, path):
+    # stream=True only keeps the chunks near the camera in memory (.lvl only)
+    # call update_stream() every frame when streaming
+    def load(self, path, stream=False):
+        self.stop_stream()
+
+        if stream and levelfile.is_level_file(path):
+            self.streamer = ChunkStreamer(self, path)
+            self.tilemap = self.streamer.grid
+            self.mapped_file = None
+            self.tile_size = self.streamer.tile_size
+            self.offgrid = SpatialHash(cell_size=self.tile_size * 4)
+            self.offgrid_tiles = self.streamer.offgrid
+            self.autotiler.clear()
+            return
+
+        if levelfile.is_level_file(path):
+            level = levelfile.load_level(path)
+            self.tilemap.load_chunks(level['types'], level['chunks'])
+            # the chunks are views into the mapped file, keep it open while we use them
+            self.mapped_file = level['mmap']
+            self.tile_size = level['tile_size']
+            self.offgrid = SpatialHash(cell_size=self.tile_size * 4)
+            self.offgrid_tiles = level['offgrid']
+            self.autotiler.clear()
+            return
+
         f = open(path, 'r')
         map_data = json.load(f)
         f.close()
 
-        self.tilemap = map_data['tilemap']
+        self.tilemap.load_dict(map_data['tilemap'])
+        self.mapped_file = None
         self.tile_size = map_data['tile_size']
+        self.offgrid = SpatialHash(cell_size=self.tile_size * 4)
         self.offgrid_tiles = map_data['offgrid']
+        self.autotiler.clear()
 
-    def autotile(self):
-        # iterate through tiles on grid
-        for loc in self.tilemap:
-            # get the tile
-            tile = self.tilemap[loc]
-            neighbors = set()
-            # look through all the neighbors
-            for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
-                # get the neighbour tile
-                check_loc = str(tile['pos'][0] + shift[0]) + ';' + str(tile['pos'][1] + shift[1])
-                # if neighbour tile exists
-                if check_loc in self.tilemap:
-                    if self.tilemap[check_loc]['type'] == tile['type']:
-                        neighbors.add(shift)
-            
-            neighbors = tuple(sorted(neighbors))
-            if (tile['type'] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):
-                tile['variant'] = AUTOTILE_MAP[neighbors]
\ No newline at end of file
+    def stop_stream(self):
+        if self.streamer:
+            self.streamer.close()
+            self.streamer = None
+            self.tilemap = ChunkGrid(solid_types=PHYSICS_TILES)
+
+    def update_stream(self, scroll, view_size, anchors=()):
+        if self.streamer:
+            self.streamer.update(scroll, view_size, anchors)
+
+    # cheap copy of everything load() sets up, to go back to later with restore()
+    def snapshot(self):
+        return {'tile_size': self.tile_size,
+                'tilemap': self.tilemap.snapshot(),
+                'offgrid': self.offgrid.copy(),
+                'mapped_file': self.mapped_file}
+
+    def restore(self, snapshot):
+        # snapshot again so the saved one stays as it is whatever we do to the tiles
+        self.stop_stream()
+        self.tile_size = snapshot['tile_size']
+        self.tilemap = snapshot['tilemap'].snapshot()
+        self.offgrid = snapshot['offgrid'].copy()
+        self.mapped_file = snapshot['mapped_file']
+        self.cache.clear()
+        self.autotiler.clear()
+
+    def autotile(self, full=True):
+        """
+        for every tile, look at the 4 neighbours (right, left, up, down)
+        the ones with the same type make a 4 bit mask
+        the mask picks the variant from a table made from AUTOTILE_MAP (see autotile.py)
+
+        full=True  -> the whole map
+        full=False -> only around tiles that changed since the last autotile
+        """
+        if full:
+            self.tilemap.load_all()
+            self.autotiler.full()
+        else:
+            self.autotiler.update()
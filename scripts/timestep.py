@@ -0,0 +1,40 @@
+class FixedTimestep:
+    """
+    runs the game logic at a fixed tick rate no matter how fast frames are drawn
+
+    every frame the time it took goes into the accumulator
+    every 1 / tick_rate seconds in there is one tick of game logic
+    -> slow frame: a few ticks to catch up (at most max_ticks, so a long freeze
+       doesn't turn into a long fast forward, the rest of the time is thrown away)
+    -> fast frame: maybe no tick at all, the frame is drawn between the last two ticks (alpha)
+    """
+    def __init__(self, tick_rate=60, max_ticks=5):
+        self.tick_rate = tick_rate
+        self.tick_seconds = 1 / tick_rate
+        self.max_ticks = max_ticks
+        self.accumulator = 0.0
+
+        self.ticks = 0
+        self.frames = 0
+        # seconds thrown away because the game couldn't keep up
+        self.dropped = 0.0
+
+    def advance(self, frame_seconds):
+        # returns how many ticks to run for a frame that took frame_seconds
+        self.frames += 1
+        self.accumulator += frame_seconds
+        # the tiny bit is for frames that are exactly one tick long but lose a bit to rounding
+        ticks = int(self.accumulator / self.tick_seconds + 1e-6)
+        if ticks > self.max_ticks:
+            self.dropped += (ticks - self.max_ticks) * self.tick_seconds
+            ticks = self.max_ticks
+        self.accumulator = max(0.0, self.accumulator - ticks * self.tick_seconds)
+        if ticks == self.max_ticks:
+            # can't keep up, don't carry the backlog into the next frame
+            self.accumulator = min(self.accumulator, self.tick_seconds)
+        self.ticks += ticks
+        return ticks
+
+    def alpha(self):
+        # how far the frame is between the last tick (0) and the next one (1)
+        return min(1.0, self.accumulator / self.tick_seconds)
@@ -0,0 +1,70 @@
+import pygame
+
+"""
+the hole the next level is seen through
+step 0 -> closed (all black), step = steps -> open as far as it goes
+
+each one draws white where you can see through, white is the colorkey
+"""
+def draw_circle(surf, step, steps):
+    # center of the circle -> middle of the screen, radius -> 8 pixels a step
+    pygame.draw.circle(surf, (255, 255, 255), (surf.get_width() // 2, surf.get_height() // 2), step * 8)
+
+def draw_diamond(surf, step, steps):
+    center = (surf.get_width() // 2, surf.get_height() // 2)
+    size = step * 11
+    if size > 0:
+        pygame.draw.polygon(surf, (255, 255, 255), [(center[0], center[1] - size), (center[0] + size, center[1]),
+                                                    (center[0], center[1] + size), (center[0] - size, center[1])])
+
+def draw_bars(surf, step, steps):
+    # black bars coming in from the top and bottom
+    height = surf.get_height() * step // steps
+    pygame.draw.rect(surf, (255, 255, 255), (0, (surf.get_height() - height) // 2, surf.get_width(), height))
+
+SHAPES = {
+    'circle': draw_circle,
+    'diamond': draw_diamond,
+    'bars': draw_bars,
+}
+
+class Transition:
+    """
+    when abs(game.transition) == 0 then you can see everything
+    when abs(game.transition) == steps then you can't see anything
+
+    there are only steps + 1 different pictures, so each one is drawn the first time it
+    is needed and kept, instead of making a new surface and drawing a circle every frame
+    the surfaces are 8 bit (black and white is all they need) so all of them together are small
+    """
+    def __init__(self, size, shape='circle', steps=30):
+        self.size = size
+        self.steps = steps
+        self.shape = shape
+        # (shape, step) -> surface
+        self.frames = {}
+
+    def frame(self, transition, shape=None):
+        shape = shape or self.shape
+        step = max(0, self.steps - abs(transition))
+        key = (shape, step)
+        if key not in self.frames:
+            # creates a surface that is black and size of the display
+            surf = pygame.Surface(self.size, 0, 8)
+            surf.fill((0, 0, 0))
+            SHAPES[shape](surf, step, self.steps)
+            # ignores the white color
+            # so the hole is white and if it ignores the white color,
+            # you will see what is behind it
+            surf.set_colorkey((255, 255, 255))
+            self.frames[key] = surf
+        return self.frames[key]
+
+    def prepare(self, shape=None):
+        # draw every step now so the first transition doesn't have to
+        for step in range(self.steps + 1):
+            self.frame(step, shape)
+
+    def render(self, surf, transition, shape=None):
+        # put the surface on the actual display of the game
+        surf.blit(self.frame(transition, shape), (0, 0))
@@ -3,7 +3,26 @@ import pygame
 
 BASE_IMG_PATH = 'data/images/'
 
-def load_image(path):
+# image -> the same image mirrored on the x-axis
+# made once, so render doesn't make a new surface with pygame.transform.flip every frame
+FLIPPED = {}
+# id(images list) -> (images, flipped images), animations share their images list
+FLIPPED_LISTS = {}
+
+def flip_image(img):
+    if img not in FLIPPED:
+        FLIPPED[img] = pygame.transform.flip(img, True, False)
+    return FLIPPED[img]
+
+def flip_images(images):
+    # keeps images in the cache too, so its id can't be reused by a new list
+    key = id(images)
+    if key not in FLIPPED_LISTS:
+        FLIPPED_LISTS[key] = (images, [flip_image(img) for img in images])
+    return FLIPPED_LISTS[key][1]
+
+# flip=True -> make the mirrored version now too (flip_image)
+def load_image(path, flip=False):
     """
     .convert() 
     converts internal representation of the image
@@ -15,6 +34,8 @@ def load_image(path):
     # make background of img transparent
     # current background is black
     img.set_colorkey((0, 0, 0))
+    if flip:
+        flip_image(img)
     return img
 
 def load_images(path):
@@ -24,11 +45,21 @@ def load_images(path):
         # we take each image from the PATH and then load it and put it in images list
         images.append(load_image(path + '/' + img_name))
 
+    # sprites face both ways, so make the mirrored frames at load time
+    flip_images(images)
     return images
 
 class Animation:
+    # no __dict__ for each animation, every entity action change makes one
+    __slots__ = ('images', 'flipped', 'loop', 'img_duration', 'done', 'frame')
+
     def __init__(self, images, img_dur= 5, loop=True):
+        self.reset(images, img_dur, loop)
+
+    def reset(self, images, img_dur= 5, loop=True):
         self.images = images
+        # mirrored frames, shared by every copy of the animation
+        self.flipped = flip_images(images)
         # animation to loop
         self.loop = loop
         self.img_duration = img_dur
@@ -42,9 +73,14 @@ class Animation:
     # anytime something wants to use that animation, copy its own instance of the animation
 
     # in python, if you assign an object to the list, its a reference to the object instead of a copy
-    def copy(self):
+    # pool -> reuse an animation from the Pool instead of making a new one
+    def copy(self, pool=None):
         # instead of returning a copy, it returns a reference
-        return Animation(self.images, self.img_duration, self.loop)
+        if pool is None:
+            return Animation(self.images, self.img_duration, self.loop)
+        animation = pool.take()
+        animation.reset(self.images, self.img_duration, self.loop)
+        return animation
     
     def update(self):
         if self.loop:
@@ -56,6 +92,20 @@ class Animation:
             if self.frame >= self.img_duration * len(self.images) - 1:
                 self.done = True
 
-    def img(self):
+    # flip -> the frame mirrored on the x-axis
+    def img(self, flip=False):
         # dividing the frame by how long the image is supposed to show for
+        if flip:
+            return self.flipped[int(self.frame / self.img_duration)]
         return self.images[int(self.frame / self.img_duration)]
+
+class SilentSound:
+    # stands in for pygame.mixer.Sound when there is no sound (headless)
+    def __init__(self, path=None):
+        self.path = path
+
+    def play(self, loops=0):
+        pass
+
+    def set_volume(self, volume):
+        pass
@@ -0,0 +1,35 @@
+from scripts import levelfile
+from scripts.chunkgrid import ChunkGrid
+
+def make_grid():
+    grid = ChunkGrid(solid_types={'grass', 'stone'})
+    for x in range(-20, 40):
+        grid.set(x, 5, 'grass', x % 4)
+        grid.set(x, 6, 'stone', 1)
+    return grid
+
+def test_save_over_loaded_level(tmp_path):
+    path = str(tmp_path / 'level.lvl')
+    levelfile.save_level(path, 16, make_grid(), [{'type': 'decor', 'variant': 2, 'pos': [8.5, 3.0]}])
+
+    # the loaded chunks are views into the mapped file
+    level = levelfile.load_level(path)
+    grid = ChunkGrid(solid_types={'grass', 'stone'})
+    grid.load_chunks(level['types'], level['chunks'])
+
+    # clear one chunk and save over the file the level came from
+    key = list(grid.chunks)[0]
+    for x, y, packed in grid.chunk_items(key):
+        grid.remove(x, y)
+    tiles = grid.to_dict()
+    levelfile.save_level(path, 16, grid, level['offgrid'])
+
+    # the level in memory is still the one we saved
+    assert grid.to_dict() == tiles
+
+    # and reading the file back gives the same tiles
+    saved = levelfile.load_level(path)
+    saved_grid = ChunkGrid()
+    saved_grid.load_chunks(saved['types'], saved['chunks'])
+    assert saved_grid.to_dict() == tiles
+    assert saved['offgrid'] == level['offgrid']